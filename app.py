@@ -1,359 +1,44 @@
 from flask import Flask, render_template, request, jsonify, send_from_directory
-from datetime import datetime
-import sqlite3
 import os
-import cv2 as cv
-import base64
-import openai
-from pydantic import BaseModel
-
-id_to_material = {
-    1 : "Glass",
-    2 : "Paper",
-    3 : "Plastic",
-    4 : "Metal",
-    5 : "Cardboard",
-    6 : "Biodegradable"
-}
-
-text_prompt = """
-Your task is to peform closed-set object classification based on a list of categories and open-set object classification to identify what the item is. For context, the items shown in the image are common trash items.
-
-Categories for closed-set object classification are: 
-1. Glass 
-2. Paper 
-3. Plastic 
-4. Metal 
-5. Cardboard 
-6. Biodegradable 
-
-Please give the output in the format of [(Categorical ID, Item description, Brand name, Weight, Recyclableness)], for example:
-[(3, Plastic Bottle, Namthip, 7, 500, Yes), (2, Paper Shopping Bag, Zurich Duty Free Shopping Bag, 30, 1500, Yes), (1, Glass Soda Bottle, Chang, 150, 500, Yes)]
-
-Do not provide any reasonings.
-
-Things to note:
-We are located in Bangkok, Thailand.
-For the brand name, try to find the product brand visually. If it is unbranded or unidentifiable, use the most common brand that produces this item in Bangkok, Thailand.
-For the weight in grams, output a single number in integer format and try to come up with an estimate by making several assumptions from the object semantic description, relative size and material (e.g. average weight of a shopping bag is 6 grams).
-For the volume in millilitres, output a number in integer format and try to come up with an estimate by making several assumptions from the object semantic description, relative size and material
-"""
-
-
-class Out(BaseModel):
-    id: int
-    item_description: str
-    brand_name: str
-    weight: int
-    volume : int
-    recyclable: bool
-class ModelOutput(BaseModel):
-    out : list[Out]
-
-def img_to_b64(img):
-    retval, buffer = cv.imencode('.png', img)
-    
-    if not retval:
-        return "Errored!"
-    
-    # 3. Perform Base64 encoding on the buffer (bytes)
-    b64_bytes = base64.b64encode(buffer)
-
-    # 4. Convert the Base64 bytes to a string for easier transmission/storage
-    return b64_bytes.decode('utf-8')
-
-def create_response(b64_str):
-    response = client.responses.parse( 
-        model="gpt-5.1", 
-        input=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "input_text", "text": text_prompt},
-                    {
-                        "type": "input_image",
-                        "image_url": b64_str
-                    },
-                ],
-            }
-        ],
-        text_format=ModelOutput 
-    )
-    
-    resp_dict = response.output_parsed.model_dump()
-    for out in resp_dict["out"]:
-        out["material"] = id_to_material[out["id"]]
-    return resp_dict
+import camera
+import services
+from bin_state import mirror
+from camera import MAX_UPLOAD_BYTES, UPLOAD_ERROR
+from classifier import classify
+from database import get_db_connection, init_db
+from idempotency import lookup as lookup_event, validate_event_id
+from resilience import Unavailable
 
 app = Flask(__name__)
-DATABASE = 'trashbin.db'
-
-from dotenv import load_dotenv
-load_dotenv()
-
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-cap = None
-if os.environ.get('WERKZEUG_RUN_MAIN'):
-    cap = cv.VideoCapture(0)
-
-# Check if the webcam was opened successfully
-if cap is not None and not cap.isOpened():
-    print("Error: Could not access the webcam.")
-    exit()
-    
-print("Webcam accessed successfully! Press 'q' to quit.")
-
-# Store latest camera image in memory
-latest_camera_image = {
-    'image': None,
-    'timestamp': None
-}
-
-# Scope 3 Emissions Factors (kg CO2e per kg of waste)
-# Based on EPA and industry standards
-EMISSIONS_FACTORS = {
-    'landfill': 0.5,  # kg CO2e per kg waste to landfill
-    'recycling': 0.1,  # kg CO2e per kg recycling process
-    'avoided': 2.0,   # kg CO2e avoided per kg recycled (avoided production emissions)
-}
-
-def calculate_co2_emissions(weight, waste_type, event_type='add'):
-    """Calculate Scope 3 CO2 emissions based on waste type and weight"""
-    if event_type == 'empty':
-        # When emptying, calculate actual emissions
-        if waste_type == 'normal':
-            # Normal waste goes to landfill
-            co2 = weight * EMISSIONS_FACTORS['landfill']
-        else:  # recycle
-            # Recycling has processing emissions but avoids production emissions
-            co2 = (weight * EMISSIONS_FACTORS['recycling']) - (weight * EMISSIONS_FACTORS['avoided'])
-        return co2
-    return 0  # No emissions during 'add' events, only when waste is processed
-
-def get_db_connection():
-    """Create a database connection"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    """Initialize the database with tables"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Create trashbin_status table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS trashbin_status (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            normal_volume REAL DEFAULT 0,
-            normal_weight REAL DEFAULT 0,
-            recycle_volume REAL DEFAULT 0,
-            recycle_weight REAL DEFAULT 0,
-            normal_capacity REAL DEFAULT 100,
-            recycle_capacity REAL DEFAULT 100,
-            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create trash_logs table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS trash_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            waste_type TEXT NOT NULL,
-            volume REAL NOT NULL,
-            weight REAL NOT NULL,
-            brand TEXT,
-            product TEXT,
-            event_type TEXT DEFAULT 'add',
-            co2_emissions REAL DEFAULT 0,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create emissions_summary table for Scope 3 tracking
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS emissions_summary (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            total_co2_landfill REAL DEFAULT 0,
-            total_co2_recycling REAL DEFAULT 0,
-            total_co2_avoided REAL DEFAULT 0,
-            net_co2_emissions REAL DEFAULT 0,
-            total_waste_diverted REAL DEFAULT 0,
-            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Add event_type column if it doesn't exist (migration)
-    try:
-        cursor.execute("SELECT event_type FROM trash_logs LIMIT 1")
-    except sqlite3.OperationalError:
-        cursor.execute("ALTER TABLE trash_logs ADD COLUMN event_type TEXT DEFAULT 'add'")
-    
-    # Add co2_emissions column if it doesn't exist (migration)
-    try:
-        cursor.execute("SELECT co2_emissions FROM trash_logs LIMIT 1")
-    except sqlite3.OperationalError:
-        cursor.execute("ALTER TABLE trash_logs ADD COLUMN co2_emissions REAL DEFAULT 0")
-    
-    # Add brand column if it doesn't exist (migration)
-    try:
-        cursor.execute("SELECT brand FROM trash_logs LIMIT 1")
-    except sqlite3.OperationalError:
-        cursor.execute("ALTER TABLE trash_logs ADD COLUMN brand TEXT")
-    
-    # Add product column if it doesn't exist (migration)
-    try:
-        cursor.execute("SELECT product FROM trash_logs LIMIT 1")
-    except sqlite3.OperationalError:
-        cursor.execute("ALTER TABLE trash_logs ADD COLUMN product TEXT")
-    
-    # Insert initial status if not exists
-    cursor.execute('SELECT COUNT(*) FROM trashbin_status')
-    if cursor.fetchone()[0] == 0:
-        cursor.execute('''
-            INSERT INTO trashbin_status 
-            (normal_volume, normal_weight, recycle_volume, recycle_weight, 
-             normal_capacity, recycle_capacity)
-            VALUES (0, 0, 0, 0, 100, 100)
-        ''')
-    
-    # Insert initial emissions summary if not exists
-    cursor.execute('SELECT COUNT(*) FROM emissions_summary')
-    if cursor.fetchone()[0] == 0:
-        cursor.execute('''
-            INSERT INTO emissions_summary 
-            (total_co2_landfill, total_co2_recycling, total_co2_avoided, 
-             net_co2_emissions, total_waste_diverted)
-            VALUES (0, 0, 0, 0, 0)
-        ''')
-    
-    conn.commit()
-    conn.close()
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 
 @app.route('/')
 def dashboard():
-    """Render the dashboard page"""
+    """Render the dashboard page (a static shell that loads /api/dashboard)"""
+    return render_template('dashboard.html')
+
+@app.route('/api/dashboard', methods=['GET'])
+def get_dashboard():
+    """API endpoint to get the dashboard aggregates, answering 304 when unchanged"""
     conn = None
     try:
         conn = get_db_connection()
-        
-        # Get current status
-        status = conn.execute('SELECT * FROM trashbin_status ORDER BY id DESC LIMIT 1').fetchone()
-        
-        # Get emissions summary
-        emissions = conn.execute('SELECT * FROM emissions_summary ORDER BY id DESC LIMIT 1').fetchone()
-        
-        # Get recent logs (last 20 entries)
-        logs = conn.execute('''
-            SELECT * FROM trash_logs 
-            ORDER BY timestamp DESC 
-            LIMIT 20
-        ''').fetchall()
-        
-        # Get statistics
-        stats = conn.execute('''
-            SELECT 
-                waste_type,
-                COUNT(*) as count,
-                SUM(volume) as total_volume,
-                SUM(weight) as total_weight,
-                AVG(volume) as avg_volume,
-                AVG(weight) as avg_weight,
-                SUM(co2_emissions) as total_co2
-            FROM trash_logs
-            GROUP BY waste_type
-        ''').fetchall()
-        
-        # Calculate monthly trend data (last 30 days)
-        monthly_emissions = conn.execute('''
-            SELECT 
-                DATE(timestamp) as date,
-                waste_type,
-                SUM(weight) as daily_weight,
-                SUM(co2_emissions) as daily_co2
-            FROM trash_logs
-            WHERE timestamp >= date('now', '-30 days')
-            GROUP BY DATE(timestamp), waste_type
-            ORDER BY date DESC
-        ''').fetchall()
-        
-        # Get hourly capacity data for today's chart
-        hourly_capacity = conn.execute('''
-            SELECT 
-                strftime('%H:00', timestamp) as hour,
-                waste_type,
-                AVG(volume) as avg_volume,
-                COUNT(*) as event_count
-            FROM trash_logs
-            WHERE DATE(timestamp) = DATE('now')
-            GROUP BY strftime('%H', timestamp), waste_type
-            ORDER BY hour
-        ''').fetchall()
-        
-        # Get daily collected weight from last 7 days
-        daily_weight_data = conn.execute('''
-            SELECT 
-                DATE(timestamp) as date,
-                waste_type,
-                SUM(CASE WHEN event_type = 'add' THEN weight ELSE 0 END) as total_weight
-            FROM trash_logs
-            WHERE timestamp >= date('now', '-7 days')
-            GROUP BY DATE(timestamp), waste_type
-            ORDER BY date ASC
-        ''').fetchall()
-        
-        # Organize daily weight data
-        daily_weights = {}
-        for row in daily_weight_data:
-            date = row['date']
-            waste_type = row['waste_type']
-            weight = row['total_weight']
-            
-            if date not in daily_weights:
-                daily_weights[date] = {'normal': 0, 'recycle': 0}
-            
-            daily_weights[date][waste_type] = weight
-        
-        # Convert to list format for chart
-        daily_capacity = []
-        for date in sorted(daily_weights.keys()):   
-            daily_capacity.append({
-                'date': date,
-                'normal_weight': daily_weights[date].get('normal', 0),
-                'recycle_weight': daily_weights[date].get('recycle', 0)
-            })
-        
-        # Get product statistics (top 10 products)
-        product_stats = conn.execute('''
-            SELECT 
-                product,
-                brand,
-                COUNT(*) as total_items,
-                SUM(CASE WHEN waste_type = 'recycle' THEN 1 ELSE 0 END) as recycle_count,
-                SUM(CASE WHEN waste_type = 'normal' THEN 1 ELSE 0 END) as normal_count,
-                SUM(weight) as total_weight,
-                SUM(co2_emissions) as total_co2
-            FROM trash_logs
-            WHERE product IS NOT NULL AND product != '' AND event_type = 'add'
-            GROUP BY LOWER(product), LOWER(brand)
-            ORDER BY total_items DESC
-            LIMIT 10
-        ''').fetchall()
-        
-        return render_template('dashboard.html', 
-                             status=status, 
-                             emissions=emissions,
-                             logs=logs, 
-                             stats=stats,
-                             product_stats=product_stats,
-                             monthly_emissions=monthly_emissions,
-                             hourly_capacity=hourly_capacity,
-                             daily_capacity=daily_capacity)
+        body, etag = services.get_dashboard(conn)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
     finally:
         if conn:
             conn.close()
-            
+
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Clients may keep a copy but must revalidate it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 
 
 @app.route('/api/trash', methods=['POST'])
@@ -362,64 +47,10 @@ def add_trash():
     conn = None
     try:
         data = request.get_json()
-        
-        waste_type = data.get('waste_type', '').lower()
-        volume = float(data.get('volume', 0))
-        weight = float(data.get('weight', 0)) * 0.001
-        brand = data.get('brand', '')
-        product = data.get('product', '')
-        
-        if waste_type not in ['normal', 'recycle']:
-            return jsonify({'error': 'Invalid waste_type. Must be "normal" or "recycle"'}), 400
-        
-        if volume <= 0 or weight <= 0:
-            return jsonify({'error': 'Volume and weight must be positive numbers'}), 400
-        
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Add log entry (no emissions during add, only during empty)
-        cursor.execute('''
-            INSERT INTO trash_logs (waste_type, volume, weight, brand, product, event_type, co2_emissions)
-            VALUES (?, ?, ?, ?, ?, 'add', 0)
-        ''', (waste_type, volume, weight, brand, product))
-        
-        # Update current status
-        if waste_type == 'normal':
-            cursor.execute('''
-                UPDATE trashbin_status
-                SET normal_volume = normal_volume + ?,
-                    normal_weight = normal_weight + ?,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE id = (SELECT MAX(id) FROM trashbin_status)
-            ''', (volume, weight))
-        else:  # recycle
-            cursor.execute('''
-                UPDATE trashbin_status
-                SET recycle_volume = recycle_volume + ?,
-                    recycle_weight = recycle_weight + ?,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE id = (SELECT MAX(id) FROM trashbin_status)
-            ''', (volume, weight))
-        
-        conn.commit()
-        
-        # Get updated status
-        status = cursor.execute('SELECT * FROM trashbin_status ORDER BY id DESC LIMIT 1').fetchone()
-        
-        result = {
-            'success': True,
-            'message': f'{waste_type.capitalize()} waste added successfully',
-            'current_status': {
-                'normal_volume': status['normal_volume'],
-                'normal_weight': status['normal_weight'],
-                'recycle_volume': status['recycle_volume'],
-                'recycle_weight': status['recycle_weight']
-            }
-        }
-        
-        return jsonify(result), 201
-        
+        result, status_code = services.add_trash(conn, data)
+        return jsonify(result), status_code
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
@@ -432,73 +63,26 @@ def add_item_json():
     conn = None
     try:
         data = request.get_json()
-        
-        # Parse JSON fields
-        recyclable = data.get('recyclable', False)
-        weight_in_gram = int(data.get('weight_in_gram', 0))
-        product_brand = data.get('product_brand', '')
-        product_name = data.get('product_name', '')
-        
-        # Validate input
-        if weight_in_gram <= 0:
-            return jsonify({'error': 'weight_in_gram must be a positive number'}), 400
-        
-        # Convert to internal format
-        waste_type = 'recycle' if recyclable else 'normal'
-        weight = weight_in_gram / 1000.0  # Convert grams to kg
-        volume = weight * 1.2  # Estimate volume (1.2L per kg as rough estimate)
-        
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Add log entry
-        cursor.execute('''
-            INSERT INTO trash_logs (waste_type, volume, weight, brand, product, event_type, co2_emissions)
-            VALUES (?, ?, ?, ?, ?, 'add', 0)
-        ''', (waste_type, volume, weight, product_brand, product_name))
-        
-        # Update current status
-        if waste_type == 'normal':
-            cursor.execute('''
-                UPDATE trashbin_status
-                SET normal_volume = normal_volume + ?,
-                    normal_weight = normal_weight + ?,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE id = (SELECT MAX(id) FROM trashbin_status)
-            ''', (volume, weight))
-        else:  # recycle
-            cursor.execute('''
-                UPDATE trashbin_status
-                SET recycle_volume = recycle_volume + ?,
-                    recycle_weight = recycle_weight + ?,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE id = (SELECT MAX(id) FROM trashbin_status)
-            ''', (volume, weight))
-        
-        conn.commit()
-        
-        # Get updated status
-        status = cursor.execute('SELECT * FROM trashbin_status ORDER BY id DESC LIMIT 1').fetchone()
-        
-        result = {
-            'success': True,
-            'message': f'{"Recyclable" if recyclable else "Normal"} item added successfully',
-            'item': {
-                'product_name': product_name,
-                'product_brand': product_brand,
-                'weight_kg': weight,
-                'recyclable': recyclable
-            },
-            'current_status': {
-                'normal_weight_kg': status['normal_weight'],
-                'recycle_weight_kg': status['recycle_weight']
-            }
-        }
-        
-        return jsonify(result), 201
-        
-    except ValueError as e:
-        return jsonify({'error': 'Invalid data format. weight_in_gram must be an integer'}), 400
+        result, status_code = services.add_item(conn, data)
+        return jsonify(result), status_code
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if conn:
+            conn.close()
+
+@app.route('/api/add-items', methods=['POST'])
+def add_items_json():
+    """API endpoint to add a batch of items in one transaction"""
+    conn = None
+    try:
+        data = request.get_json()
+        conn = get_db_connection()
+        result, status_code = services.add_items(conn, data)
+        return jsonify(result), status_code
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
@@ -511,123 +95,10 @@ def reset_bin():
     conn = None
     try:
         data = request.get_json()
-        waste_type = data.get('waste_type', 'both').lower()
-        
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if waste_type == 'normal':
-            # Get current values before reset
-            current = cursor.execute('SELECT normal_volume, normal_weight FROM trashbin_status ORDER BY id DESC LIMIT 1').fetchone()
-            
-            # Calculate emissions for landfill
-            co2_emitted = calculate_co2_emissions(current['normal_weight'], 'normal', 'empty')
-            
-            cursor.execute('''
-                UPDATE trashbin_status
-                SET normal_volume = 0,
-                    normal_weight = 0,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE id = (SELECT MAX(id) FROM trashbin_status)
-            ''')
-            
-            # Log the empty event with emissions
-            cursor.execute('''
-                INSERT INTO trash_logs (waste_type, volume, weight, event_type, co2_emissions)
-                VALUES ('normal', ?, ?, 'empty', ?)
-            ''', (current['normal_volume'], current['normal_weight'], co2_emitted))
-            
-            # Update emissions summary
-            cursor.execute('''
-                UPDATE emissions_summary
-                SET total_co2_landfill = total_co2_landfill + ?,
-                    net_co2_emissions = net_co2_emissions + ?,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE id = (SELECT MAX(id) FROM emissions_summary)
-            ''', (co2_emitted, co2_emitted))
-            
-        elif waste_type == 'recycle':
-            # Get current values before reset
-            current = cursor.execute('SELECT recycle_volume, recycle_weight FROM trashbin_status ORDER BY id DESC LIMIT 1').fetchone()
-            
-            # Calculate net emissions (negative because recycling avoids more emissions than it creates)
-            co2_emitted = calculate_co2_emissions(current['recycle_weight'], 'recycle', 'empty')
-            co2_avoided = current['recycle_weight'] * EMISSIONS_FACTORS['avoided']
-            
-            cursor.execute('''
-                UPDATE trashbin_status
-                SET recycle_volume = 0,
-                    recycle_weight = 0,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE id = (SELECT MAX(id) FROM trashbin_status)
-            ''')
-            
-            # Log the empty event with net emissions
-            cursor.execute('''
-                INSERT INTO trash_logs (waste_type, volume, weight, event_type, co2_emissions)
-                VALUES ('recycle', ?, ?, 'empty', ?)
-            ''', (current['recycle_volume'], current['recycle_weight'], co2_emitted))
-            
-            # Update emissions summary
-            cursor.execute('''
-                UPDATE emissions_summary
-                SET total_co2_recycling = total_co2_recycling + ?,
-                    total_co2_avoided = total_co2_avoided + ?,
-                    net_co2_emissions = net_co2_emissions + ?,
-                    total_waste_diverted = total_waste_diverted + ?,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE id = (SELECT MAX(id) FROM emissions_summary)
-            ''', (abs(co2_emitted) if co2_emitted > 0 else 0, co2_avoided, co2_emitted, current['recycle_weight']))
-            
-        else:  # both
-            # Get current values before reset
-            current = cursor.execute('SELECT normal_volume, normal_weight, recycle_volume, recycle_weight FROM trashbin_status ORDER BY id DESC LIMIT 1').fetchone()
-            
-            # Calculate emissions for both bins
-            normal_co2 = calculate_co2_emissions(current['normal_weight'], 'normal', 'empty')
-            recycle_co2 = calculate_co2_emissions(current['recycle_weight'], 'recycle', 'empty')
-            recycle_avoided = current['recycle_weight'] * EMISSIONS_FACTORS['avoided']
-            
-            cursor.execute('''
-                UPDATE trashbin_status
-                SET normal_volume = 0,
-                    normal_weight = 0,
-                    recycle_volume = 0,
-                    recycle_weight = 0,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE id = (SELECT MAX(id) FROM trashbin_status)
-            ''')
-            
-            # Log the empty events for both bins with emissions
-            cursor.execute('''
-                INSERT INTO trash_logs (waste_type, volume, weight, event_type, co2_emissions)
-                VALUES ('normal', ?, ?, 'empty', ?)
-            ''', (current['normal_volume'], current['normal_weight'], normal_co2))
-            
-            cursor.execute('''
-                INSERT INTO trash_logs (waste_type, volume, weight, event_type, co2_emissions)
-                VALUES ('recycle', ?, ?, 'empty', ?)
-            ''', (current['recycle_volume'], current['recycle_weight'], recycle_co2))
-            
-            # Update emissions summary
-            cursor.execute('''
-                UPDATE emissions_summary
-                SET total_co2_landfill = total_co2_landfill + ?,
-                    total_co2_recycling = total_co2_recycling + ?,
-                    total_co2_avoided = total_co2_avoided + ?,
-                    net_co2_emissions = net_co2_emissions + ?,
-                    total_waste_diverted = total_waste_diverted + ?,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE id = (SELECT MAX(id) FROM emissions_summary)
-            ''', (normal_co2, abs(recycle_co2) if recycle_co2 > 0 else 0, recycle_avoided, normal_co2 + recycle_co2, current['recycle_weight']))
-        
-        conn.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': f'{waste_type.capitalize()} bin reset successfully'
-        }), 200
-        
+        result, status_code = services.reset_bin(conn, data)
+        return jsonify(result), status_code
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
@@ -636,28 +107,40 @@ def reset_bin():
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
-    """API endpoint to get current status"""
+    """API endpoint to get current status from the in-memory mirror"""
+    try:
+        snapshot = mirror.snapshot()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    if request.if_none_match.contains(snapshot.etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(snapshot.body, mimetype='application/json')
+    response.set_etag(snapshot.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/forecast', methods=['GET'])
+def get_forecast():
+    """API endpoint to forecast time to full and suggest collections"""
     conn = None
     try:
         conn = get_db_connection()
-        status = conn.execute('SELECT * FROM trashbin_status ORDER BY id DESC LIMIT 1').fetchone()
-        
-        return jsonify({
-            'normal_volume': status['normal_volume'],
-            'normal_weight': status['normal_weight'],
-            'recycle_volume': status['recycle_volume'],
-            'recycle_weight': status['recycle_weight'],
-            'normal_capacity': status['normal_capacity'],
-            'recycle_capacity': status['recycle_capacity'],
-            'last_updated': status['last_updated']
-        }), 200
-        
+        result, status_code = services.get_forecast(conn, request.args)
+        return jsonify(result), status_code
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
         if conn:
             conn.close()
 
+@app.route('/sw.js')
+def service_worker():
+    """Serve the service worker from the root so it controls the page and the API"""
+    return send_from_directory('static', 'sw.js', mimetype='application/javascript')
+
 @app.route('/static/icon-192.png')
 @app.route('/static/icon-512.png')
 def serve_icon():
@@ -666,91 +149,113 @@ def serve_icon():
 
 @app.route('/api/detect', methods=['GET'])
 def camera_feed():
-    """API endpoint to receive and store base64 encoded image"""
-    global latest_camera_image
-    
-    if latest_camera_image["image"] is None:
-        print("Can't receive frame (stream end?). Exiting ...")
-        return jsonify({'error': 'No image data provided'}), 400
-    
-    print("Running inference!")
-    
-    resp_dict = create_response(latest_camera_image["image"])
-    
-    for out in resp_dict["out"]:
-        recyclable = out["recyclable"]
-        volume = out["volume"] * 0.001
-        weight = out["weight"] * 0.001
-        brand = out["brand_name"]
-        product = out["item_description"]
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        waste_type = "normal" if not recyclable else "recycle"
-        
-        # Add log entry (no emissions during add, only during empty)
-        cursor.execute('''
-            INSERT INTO trash_logs (waste_type, volume, weight, brand, product, event_type, co2_emissions)
-            VALUES (?, ?, ?, ?, ?, 'add', 0)
-        ''', (waste_type, volume, weight, brand, product))
-        
-        # Update current status
-        if not recyclable:
-            cursor.execute('''
-                UPDATE trashbin_status
-                SET normal_volume = normal_volume + ?,
-                    normal_weight = normal_weight + ?,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE id = (SELECT MAX(id) FROM trashbin_status)
-            ''', (volume, weight))
-        else:  # recycle
-            cursor.execute('''
-                UPDATE trashbin_status
-                SET recycle_volume = recycle_volume + ?,
-                    recycle_weight = recycle_weight + ?,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE id = (SELECT MAX(id) FROM trashbin_status)
-            ''', (volume, weight))
-    
-    conn.commit()
-
-    return jsonify(resp_dict), 200
-    
+    """API endpoint to classify the latest image of a camera"""
+    event_id = request.args.get('event_id')
+
+    error = validate_event_id(event_id)
+    if error:
+        return jsonify({'error': error}), 400
+
+    cam = camera.get_camera(request.args.get('camera'))
+    if cam is None:
+        return jsonify({'error': f"Unknown camera: {request.args.get('camera')}"}), 404
+
+    b64_str, timestamp = cam.snapshot()
+    return run_detection(b64_str, event_id)
+
+def run_detection(image, event_id):
+    """Classify an image and record its items, at most once per event_id"""
+    conn = get_db_connection()
+    try:
+        # A retried detection returns the original result without re-running inference
+        previous = lookup_event(conn, event_id, 'detect')
+        if previous is not None:
+            return jsonify(previous[0]), previous[1]
+
+        if image is None:
+            print("Can't receive frame (stream end?). Exiting ...")
+            return jsonify({'error': 'No image data provided'}), 400
+
+        print("Running inference!")
+
+        try:
+            resp_dict = classify(image)
+        except Unavailable as e:
+            payload, status_code, headers = services.unavailable_result(e)
+            return jsonify(payload), status_code, headers
+        result, status_code = services.record_detections(conn, resp_dict, event_id)
+    finally:
+        conn.close()
+
+    return jsonify(result), status_code
+
+@app.route('/api/camera-feed', methods=['POST'])
+def upload_camera_image():
+    """API endpoint to receive a camera image as a raw body, multipart file or base64 JSON"""
+    event_id = request.args.get('event_id')
+
+    error = validate_event_id(event_id)
+    if error:
+        return jsonify({'error': error}), 400
+
+    cam = camera.get_camera(request.args.get('camera'))
+    if cam is None:
+        return jsonify({'error': f"Unknown camera: {request.args.get('camera')}"}), 404
+
+    json_data = request.get_json(silent=True) if request.is_json else None
+    b64_str = cam.put_image(camera.parse_upload(request.files.get('image'), json_data,
+                                                request.get_data(), request.mimetype))
+
+    if b64_str is None:
+        return jsonify({'error': UPLOAD_ERROR}), 400
+
+    # Edge devices can classify the uploaded image in the same request
+    if request.args.get('detect', '').lower() in ['1', 'true', 'yes']:
+        return run_detection(b64_str, event_id)
+
+    return jsonify({
+        'success': True,
+        'camera': cam.camera_id,
+        'timestamp': cam.status()['timestamp']
+    }), 200
 
 @app.route('/api/camera-feed', methods=['GET'])
 def get_camera_feed():
-    """API endpoint to retrieve the latest camera image"""
-    ret, ori_frame = cap.read()
-        
-    # If the frame was not read correctly, break the loop
-    if not ret:
-        print("Can't receive frame (stream end?). Exiting ...")
+    """API endpoint to retrieve the latest image of a camera"""
+    cam = camera.get_camera(request.args.get('camera'))
+    if cam is None:
+        return jsonify({'error': f"Unknown camera: {request.args.get('camera')}"}), 404
+
+    b64_str, timestamp = cam.snapshot()
+
+    if b64_str is None:
         return jsonify({
             'success': False,
             'message': 'No image available'
         }), 404
-    
-    b64_str = img_to_b64(ori_frame)
-    
-    if not b64_str.startswith('data:image'):
-        # Add proper data URI prefix if not present
-        b64_str = f'data:image/jpeg;base64,{b64_str}'
-        
-    latest_camera_image['image'] = b64_str
-    latest_camera_image['timestamp'] = datetime.now().isoformat()
-    
+
     return jsonify({
         'success': True,
+        'camera': cam.camera_id,
         'image': b64_str,
-        'timestamp': datetime.now().isoformat()
+        'timestamp': timestamp,
+        'changed_at': cam.changed_at
     }), 200
 
+@app.route('/api/cameras', methods=['GET'])
+def list_cameras():
+    """API endpoint to list the configured cameras"""
+    return jsonify({'cameras': [cam.status() for cam in camera.cameras.values()]}), 200
+
 if __name__ == '__main__':
     # Initialize database on startup
     init_db()
+
+    # Only the reloader's child process serves requests, so only it opens the cameras.
+    # Without a camera config, watch the first webcam.
+    if os.environ.get('WERKZEUG_RUN_MAIN'):
+        camera.start_cameras(camera.load_config() or [{'id': camera.DEFAULT_CAMERA_ID, 'source': 0}])
+
     app.run(debug=True, host='0.0.0.0', port=5000)
-    
-    if cap is not None:
-        cap.release()
-    cv.destroyAllWindows()
+
+    camera.stop_cameras()
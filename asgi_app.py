@@ -0,0 +1,253 @@
+"""
+Asyncio (ASGI) variant of the dashboard API
+
+Serves the same endpoints as app.py, but detections await the async OpenAI
+client and all SQLite work runs on a small dedicated executor, so hundreds of
+in-flight detections and status polls share one process without a thread per
+request.
+
+Usage:
+    hypercorn asgi_app:app --bind 0.0.0.0:5000
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from quart import Quart, render_template, request, jsonify, send_from_directory
+import camera
+import services
+from bin_state import mirror
+from camera import MAX_UPLOAD_BYTES, UPLOAD_ERROR
+from classifier import classify_async
+from database import get_db_connection, init_db
+from idempotency import lookup as lookup_event, validate_event_id
+from resilience import Unavailable
+
+# SQLite serializes writers, so a handful of threads is enough for all requests
+DB_WORKERS = int(os.getenv("DB_WORKERS", "4"))
+
+app = Quart(__name__)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix='db')
+
+def _with_connection(func, *args):
+    """Open a connection, run func(conn, *args) and close it (runs on the DB executor)"""
+    conn = get_db_connection()
+    try:
+        return func(conn, *args)
+    finally:
+        conn.close()
+
+async def run_db(func, *args):
+    """Run a services function on the DB executor without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, _with_connection, func, *args)
+
+@app.before_serving
+async def startup():
+    """Initialize the database and start the configured cameras"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(db_executor, init_db)
+    # Load the status mirror before the first poll, so requests never touch the database
+    await loop.run_in_executor(db_executor, mirror.snapshot)
+    specs = camera.load_config()
+    if specs:
+        camera.start_cameras(specs)
+
+@app.after_serving
+async def shutdown():
+    """Stop the cameras, the status refresher and the DB executor"""
+    camera.stop_cameras()
+    mirror.stop()
+    db_executor.shutdown(wait=True)
+
+@app.route('/')
+async def dashboard():
+    """Render the dashboard page (a static shell that loads /api/dashboard)"""
+    return await render_template('dashboard.html')
+
+@app.route('/api/dashboard', methods=['GET'])
+async def get_dashboard():
+    """API endpoint to get the dashboard aggregates, answering 304 when unchanged"""
+    try:
+        body, etag = await run_db(services.get_dashboard)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    if request.if_none_match.contains(etag):
+        response = app.response_class('', status=304)
+    else:
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Clients may keep a copy but must revalidate it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/trash', methods=['POST'])
+async def add_trash():
+    """API endpoint to add trash entry"""
+    try:
+        data = await request.get_json()
+        result, status_code = await run_db(services.add_trash, data)
+        return jsonify(result), status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/add-item', methods=['POST'])
+async def add_item_json():
+    """API endpoint to add item with simplified JSON format"""
+    try:
+        data = await request.get_json()
+        result, status_code = await run_db(services.add_item, data)
+        return jsonify(result), status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/add-items', methods=['POST'])
+async def add_items_json():
+    """API endpoint to add a batch of items in one transaction"""
+    try:
+        data = await request.get_json()
+        result, status_code = await run_db(services.add_items, data)
+        return jsonify(result), status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/reset', methods=['POST'])
+async def reset_bin():
+    """API endpoint to reset/empty the trash bin"""
+    try:
+        data = await request.get_json()
+        result, status_code = await run_db(services.reset_bin, data)
+        return jsonify(result), status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/status', methods=['GET'])
+async def get_status():
+    """API endpoint to get current status from the in-memory mirror"""
+    snapshot = mirror.snapshot()
+    if request.if_none_match.contains(snapshot.etag):
+        response = app.response_class('', status=304)
+    else:
+        response = app.response_class(snapshot.body, mimetype='application/json')
+    response.set_etag(snapshot.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/forecast', methods=['GET'])
+async def get_forecast():
+    """API endpoint to forecast time to full and suggest collections"""
+    try:
+        result, status_code = await run_db(services.get_forecast, request.args)
+        return jsonify(result), status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/sw.js')
+async def service_worker():
+    """Serve the service worker from the root so it controls the page and the API"""
+    return await send_from_directory('static', 'sw.js', mimetype='application/javascript')
+
+@app.route('/static/icon-192.png')
+@app.route('/static/icon-512.png')
+async def serve_icon():
+    """Serve the SVG icon for both sizes"""
+    return await send_from_directory('static', 'icon.svg', mimetype='image/svg+xml')
+
+@app.route('/api/detect', methods=['GET'])
+async def camera_feed():
+    """API endpoint to classify the latest image of a camera"""
+    event_id = request.args.get('event_id')
+
+    error = validate_event_id(event_id)
+    if error:
+        return jsonify({'error': error}), 400
+
+    cam = camera.get_camera(request.args.get('camera'))
+    if cam is None:
+        return jsonify({'error': f"Unknown camera: {request.args.get('camera')}"}), 404
+
+    loop = asyncio.get_running_loop()
+    b64_str, timestamp = await loop.run_in_executor(None, cam.snapshot)
+    return await run_detection(b64_str, event_id)
+
+async def run_detection(image, event_id):
+    """Classify an image and record its items, at most once per event_id"""
+    # A retried detection returns the original result without re-running inference
+    previous = await run_db(lookup_event, event_id, 'detect')
+    if previous is not None:
+        return jsonify(previous[0]), previous[1]
+
+    if image is None:
+        return jsonify({'error': 'No image data provided'}), 400
+
+    try:
+        resp_dict = await classify_async(image)
+    except Unavailable as e:
+        payload, status_code, headers = services.unavailable_result(e)
+        return jsonify(payload), status_code, headers
+    result, status_code = await run_db(services.record_detections, resp_dict, event_id)
+    return jsonify(result), status_code
+
+@app.route('/api/camera-feed', methods=['POST'])
+async def upload_camera_image():
+    """API endpoint to receive a camera image as a raw body, multipart file or base64 JSON"""
+    event_id = request.args.get('event_id')
+
+    error = validate_event_id(event_id)
+    if error:
+        return jsonify({'error': error}), 400
+
+    cam = camera.get_camera(request.args.get('camera'))
+    if cam is None:
+        return jsonify({'error': f"Unknown camera: {request.args.get('camera')}"}), 404
+
+    files = await request.files
+    json_data = (await request.get_json(silent=True)) if request.is_json else None
+    b64_str = cam.put_image(camera.parse_upload(files.get('image'), json_data,
+                                                await request.get_data(), request.mimetype))
+
+    if b64_str is None:
+        return jsonify({'error': UPLOAD_ERROR}), 400
+
+    # Edge devices can classify the uploaded image in the same request
+    if request.args.get('detect', '').lower() in ['1', 'true', 'yes']:
+        return await run_detection(b64_str, event_id)
+
+    return jsonify({
+        'success': True,
+        'camera': cam.camera_id,
+        'timestamp': cam.status()['timestamp']
+    }), 200
+
+@app.route('/api/camera-feed', methods=['GET'])
+async def get_camera_feed():
+    """API endpoint to retrieve the latest image of a camera"""
+    cam = camera.get_camera(request.args.get('camera'))
+    if cam is None:
+        return jsonify({'error': f"Unknown camera: {request.args.get('camera')}"}), 404
+
+    loop = asyncio.get_running_loop()
+    b64_str, timestamp = await loop.run_in_executor(None, cam.snapshot)
+
+    if b64_str is None:
+        return jsonify({
+            'success': False,
+            'message': 'No image available'
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'camera': cam.camera_id,
+        'image': b64_str,
+        'timestamp': timestamp,
+        'changed_at': cam.changed_at
+    }), 200
+
+@app.route('/api/cameras', methods=['GET'])
+async def list_cameras():
+    """API endpoint to list the configured cameras"""
+    return jsonify({'cameras': [cam.status() for cam in camera.cameras.values()]}), 200
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000)
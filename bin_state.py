@@ -0,0 +1,100 @@
+"""
+In-memory mirror of the bin status and emissions summary
+
+/api/status is polled by every display and bin, so it is answered from a
+snapshot held in memory instead of SQLite. A snapshot holds the latest
+trashbin_status and emissions_summary rows, plus the pre-encoded status
+response and its ETag. It is rebuilt after every committed write in this
+process. A background thread also reloads it every STATUS_REFRESH_INTERVAL
+seconds, to pick up writes from other processes (seed script, backfill,
+other workers); set that to 0 to turn it off.
+
+Snapshots are replaced whole and never modified, so readers need no lock.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from database import get_db_connection
+
+STATUS_REFRESH_INTERVAL = float(os.getenv("STATUS_REFRESH_INTERVAL", "1.0"))
+
+STATUS_FIELDS = ('normal_volume', 'normal_weight', 'recycle_volume', 'recycle_weight',
+                 'normal_capacity', 'recycle_capacity', 'last_updated')
+
+
+class Snapshot:
+    """Immutable bin state with the encoded /api/status response"""
+
+    __slots__ = ('status', 'emissions', 'body', 'etag', 'loaded_at')
+
+    def __init__(self, status, emissions):
+        self.status = status
+        self.emissions = emissions
+        payload = {field: status[field] for field in STATUS_FIELDS} if status else None
+        self.body = json.dumps(payload, separators=(',', ':'))
+        # The body includes last_updated, so its hash alone identifies the state
+        self.etag = hashlib.sha1(self.body.encode()).hexdigest()
+        self.loaded_at = time.monotonic()
+
+
+class BinStateMirror:
+    """Thread-safe holder of the latest Snapshot"""
+
+    def __init__(self, refresh_interval=STATUS_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def refresh(self, conn=None):
+        """Reload the snapshot from the database (after a commit, or periodically)"""
+        own_conn = conn is None
+        if own_conn:
+            conn = get_db_connection()
+        try:
+            # One reload at a time, so an older read never replaces a newer one
+            with self._lock:
+                status = conn.execute('SELECT * FROM trashbin_status ORDER BY id DESC LIMIT 1').fetchone()
+                emissions = conn.execute('SELECT * FROM emissions_summary ORDER BY id DESC LIMIT 1').fetchone()
+                self._snapshot = Snapshot(dict(status) if status else None,
+                                          dict(emissions) if emissions else None)
+                return self._snapshot
+        finally:
+            if own_conn:
+                conn.close()
+
+    def snapshot(self):
+        """Get the current snapshot, loading it (and starting the refresher) on first use"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.refresh()
+            self.start()
+        return snapshot
+
+    def start(self):
+        """Start the periodic refresher thread"""
+        with self._lock:
+            if self._thread is not None or self.refresh_interval <= 0:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='bin-state', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing bin state: {e}")
+
+
+mirror = BinStateMirror()
@@ -0,0 +1,337 @@
+"""
+Camera registry with per-source capture threads and frame buffers
+
+Cameras are configured in a JSON file (CAMERAS_CONFIG, default cameras.json):
+
+    {"cameras": [
+        {"id": "lobby", "source": 0},
+        {"id": "kitchen", "source": "rtsp://10.0.0.5/stream1"},
+        {"id": "replay", "source": "recordings/bin.mp4", "fps": 10, "loop": true},
+        {"id": "samples", "source": "samples/", "realtime": false}
+    ]}
+
+A source is a device index, an RTSP/HTTP stream URL, a video file or a
+folder of images. Files and folders are replayed at their own frame rate (or
+"fps"), or as fast as they can be read when "realtime" is false. Cameras
+without a source only hold the images that edge devices upload to them.
+
+Each capturing camera has its own thread. Decoding, resizing and change
+detection run inside OpenCV, which releases the GIL, so several cameras
+capture in parallel. Frames are only JPEG-encoded when a client asks for
+them.
+
+OpenCV is imported on first capture or encode, so uploads and the rest of
+the API work without it. With HEADLESS=1 no capture threads are started
+and every camera only holds uploaded images.
+"""
+import base64
+import json
+import mimetypes
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+CAMERAS_CONFIG = os.getenv("CAMERAS_CONFIG", "cameras.json")
+DEFAULT_CAMERA_ID = 'default'
+HEADLESS = os.getenv("HEADLESS", "").lower() in ('1', 'true', 'yes')
+
+# Mean absolute difference (0-255) between downscaled grayscale frames that counts as a change
+CHANGE_THRESHOLD = 8.0
+CHANGE_SIZE = (64, 48)
+JPEG_QUALITY = 85
+MAX_RECONNECT_DELAY = 30
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# Image folders are replayed at one frame per second unless "fps" is set
+FOLDER_FPS = 1.0
+# Value of cv.CAP_PROP_FPS, so capture frame rates can be read without importing OpenCV
+CAP_PROP_FPS = 5
+
+UPLOAD_MIME_TYPES = ('image/jpeg', 'image/png')
+MAX_UPLOAD_BYTES = 16 * 1024 * 1024
+UPLOAD_ERROR = 'Send an image/jpeg or image/png body, a multipart "image" file or JSON with a base64 "image"'
+
+
+def encode_frame(frame):
+    """Encode a BGR frame as a JPEG data URI, or None if encoding fails"""
+    import cv2 as cv
+    retval, buffer = cv.imencode('.jpg', frame, [cv.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+
+    if not retval:
+        return None
+
+    return f'data:image/jpeg;base64,{base64.b64encode(buffer).decode("utf-8")}'
+
+def upload_to_data_uri(data, mime_type):
+    """Convert an uploaded image (raw bytes) into a data URI
+
+    Returns None if the type is not supported
+    """
+    if mime_type not in UPLOAD_MIME_TYPES or not data:
+        return None
+
+    return f'data:{mime_type};base64,{base64.b64encode(data).decode("utf-8")}'
+
+def normalize_data_uri(b64_str):
+    """Add a data URI prefix to a base64 image if it has none (None if it is not a string)"""
+    if not isinstance(b64_str, str) or not b64_str:
+        return None
+
+    if not b64_str.startswith('data:image'):
+        b64_str = f'data:image/jpeg;base64,{b64_str}'
+
+    return b64_str
+
+def parse_upload(upload, json_data, body, mime_type):
+    """Get the data URI of an uploaded image, or None if there is no usable image
+
+    upload is a multipart "image" file (or None), json_data the parsed JSON
+    body (or None) and body the raw request body with its mime_type. A
+    multipart file wins over JSON, which wins over the raw body.
+    """
+    if upload is not None:
+        upload_type = upload.mimetype
+        if upload_type not in UPLOAD_MIME_TYPES:
+            upload_type = mimetypes.guess_type(upload.filename or '')[0]
+        return upload_to_data_uri(upload.read(), upload_type)
+    if json_data is not None:
+        return normalize_data_uri(json_data.get('image') if isinstance(json_data, dict) else None)
+    return upload_to_data_uri(body, mime_type)
+
+
+class FolderCapture:
+    """Read the images in a folder (0.jpg, 1.jpg, ...) like a cv.VideoCapture"""
+
+    def __init__(self, directory):
+        def order(name):
+            stem = os.path.splitext(name)[0]
+            return (0, int(stem), name) if re.fullmatch(r'\d+', stem) else (1, 0, name)
+
+        self.paths = [os.path.join(directory, name)
+                      for name in sorted(os.listdir(directory), key=order)
+                      if name.lower().endswith(IMAGE_EXTENSIONS)]
+        self.position = 0
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self):
+        import cv2 as cv
+        while self.position < len(self.paths):
+            frame = cv.imread(self.paths[self.position])
+            self.position += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def get(self, prop):
+        return FOLDER_FPS if prop == CAP_PROP_FPS else 0
+
+    def release(self):
+        self.position = len(self.paths)
+
+def open_source(source):
+    """Open a device index, stream URL, video file or image folder for reading"""
+    if isinstance(source, str) and os.path.isdir(source):
+        return FolderCapture(source)
+    import cv2 as cv
+    return cv.VideoCapture(source)
+
+def is_replay_source(source):
+    """Whether a source is a recording (video file or image folder) rather than a live feed"""
+    return isinstance(source, str) and os.path.exists(source)
+
+
+class Camera:
+    """One image source with its own capture thread, frame buffer and change detector"""
+
+    def __init__(self, camera_id, source=None, fps=None, loop=True, realtime=True,
+                 change_threshold=CHANGE_THRESHOLD):
+        self.camera_id = camera_id
+        self.source = source
+        self.fps = fps
+        self.loop = loop
+        self.realtime = realtime
+        self.change_threshold = change_threshold
+        self.frames_read = 0
+        self.changed_at = None
+
+        self._lock = threading.Lock()
+        self._frame = None
+        self._frame_id = 0
+        self._timestamp = None
+        self._encoded = None
+        self._reference = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_replay(self):
+        return is_replay_source(self.source)
+
+    def frame_interval(self, cap):
+        """Seconds between frames when pacing a capture, 0 to read as fast as possible"""
+        if self.is_replay and not self.realtime:
+            return 0
+        if self.is_replay or self.fps:
+            return 1.0 / (self.fps or cap.get(CAP_PROP_FPS) or 30)
+        return 0
+
+    def start(self):
+        """Start the capture thread (cameras without a source have none)"""
+        if self.source is None or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f'camera-{self.camera_id}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        """Read frames until stopped, reconnecting with back-off when the source drops"""
+        delay = 1
+        while not self._stop.is_set():
+            cap = open_source(self.source)
+            if not cap.isOpened():
+                print(f"Error: Could not access camera '{self.camera_id}', retrying in {delay}s")
+                self._stop.wait(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                continue
+
+            delay = 1
+            print(f"Camera '{self.camera_id}' accessed successfully!")
+
+            # Recordings are paced to real time; live sources block in read() at their own rate
+            interval = self.frame_interval(cap)
+
+            while not self._stop.is_set():
+                started = time.monotonic()
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                self.put_frame(frame)
+                if interval:
+                    self._stop.wait(max(0, interval - (time.monotonic() - started)))
+
+            cap.release()
+            if self.is_replay and not self.loop:
+                break
+
+    def put_frame(self, frame):
+        """Store a captured frame and update the change detector
+
+        Returns True if the frame differs from the previous one.
+        """
+        import cv2 as cv
+        small = cv.cvtColor(cv.resize(frame, CHANGE_SIZE, interpolation=cv.INTER_AREA), cv.COLOR_BGR2GRAY)
+        now = datetime.now().isoformat()
+
+        changed = False
+        with self._lock:
+            if self._reference is not None:
+                if cv.mean(cv.absdiff(small, self._reference))[0] > self.change_threshold:
+                    self.changed_at = now
+                    changed = True
+            self._reference = small
+            self._frame = frame
+            self._frame_id += 1
+            self._timestamp = now
+            self.frames_read += 1
+        return changed
+
+    def put_image(self, b64_str):
+        """Store an already encoded image, e.g. one uploaded by an edge device"""
+        if b64_str is None:
+            return None
+
+        with self._lock:
+            self._frame = None
+            self._frame_id += 1
+            self._encoded = (self._frame_id, b64_str)
+            self._timestamp = datetime.now().isoformat()
+            self.changed_at = self._timestamp
+        return b64_str
+
+    def snapshot(self):
+        """Get the latest image as (data URI, timestamp), or (None, None) if there is none
+
+        Each frame is encoded at most once, however many viewers and
+        detections ask for it.
+        """
+        with self._lock:
+            frame, frame_id, timestamp, encoded = self._frame, self._frame_id, self._timestamp, self._encoded
+
+        if encoded is not None and encoded[0] == frame_id:
+            return encoded[1], timestamp
+        if frame is None:
+            return None, None
+
+        b64_str = encode_frame(frame)
+        with self._lock:
+            if self._frame_id == frame_id:
+                self._encoded = (frame_id, b64_str)
+        return b64_str, timestamp
+
+    def status(self):
+        return {
+            'id': self.camera_id,
+            'source': None if self.source is None else str(self.source),
+            'running': self._thread is not None and self._thread.is_alive(),
+            'frames_read': self.frames_read,
+            'timestamp': self._timestamp,
+            'changed_at': self.changed_at
+        }
+
+
+# Cameras by ID; until cameras are configured, uploads go to a default camera without a source
+cameras = {DEFAULT_CAMERA_ID: Camera(DEFAULT_CAMERA_ID)}
+
+def load_config(path=CAMERAS_CONFIG):
+    """Read camera specs from the config file
+
+    Falls back to the CAMERA_INDEX environment variable and returns None
+    when neither is set.
+    """
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)['cameras']
+    if os.getenv("CAMERA_INDEX"):
+        return [{'id': DEFAULT_CAMERA_ID, 'source': int(os.getenv("CAMERA_INDEX"))}]
+    return None
+
+def start_cameras(specs):
+    """Replace the registered cameras with specs and start their capture threads
+
+    In headless mode the cameras are registered without their sources.
+    """
+    stop_cameras()
+    cameras.clear()
+    for spec in specs:
+        camera_id = str(spec['id'])
+        cameras[camera_id] = Camera(
+            camera_id,
+            source=None if HEADLESS else spec.get('source'),
+            fps=spec.get('fps'),
+            loop=spec.get('loop', True),
+            realtime=spec.get('realtime', True),
+            change_threshold=spec.get('change_threshold', CHANGE_THRESHOLD)
+        )
+    for cam in cameras.values():
+        cam.start()
+
+def stop_cameras():
+    """Stop all capture threads"""
+    for cam in cameras.values():
+        cam.stop()
+
+def get_camera(camera_id=None):
+    """Look up a camera by ID (the first configured camera by default), or None"""
+    if camera_id is None:
+        return next(iter(cameras.values()), None)
+    return cameras.get(camera_id)
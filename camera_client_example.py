@@ -1,66 +1,230 @@
 """
 Example Camera Client
-This script demonstrates how to send images to the dashboard's camera feed.
+This script sends images to the dashboard's camera feed from edge devices.
 Any camera server can use this approach to broadcast images to all connected users.
 
+Images are uploaded as raw image/jpeg or image/png bodies (no base64
+inflation) over a pooled keep-alive session. In watch mode new files in a
+directory are uploaded concurrently. Uploads that fail because the dashboard
+is unreachable are kept in an on-disk spool and retried with exponential
+back-off; each spooled image keeps its event_id, so retries with --detect
+are never counted twice. Spooled images the dashboard rejects (4xx) are
+moved to the spool's rejected/ folder, so they do not hold up the rest.
+
 Usage:
-    python camera_client_example.py <image_file>
-    
+    python camera_client_example.py <image_file> [<image_file> ...]
+    python camera_client_example.py --watch <directory> [--workers 4] [--detect]
+
 Example:
     python camera_client_example.py photo.jpg
+    python camera_client_example.py --watch /var/spool/camera --detect --spool ./spool
+    python camera_client_example.py --camera kitchen photo.jpg
 """
 
-import requests
-import base64
+import argparse
+import os
+import random
+import shutil
 import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import requests
+from requests.adapters import HTTPAdapter
+
 # Dashboard API endpoint
-DASHBOARD_URL = "http://localhost:5000/api/camera-feed"
+DASHBOARD_URL = os.getenv("DASHBOARD_URL", "http://localhost:5000/api/camera-feed")
+
+IMAGE_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png'
+}
+
+# (connect, read) timeouts in seconds; detection waits on the vision model
+TIMEOUT = (3.05, 60)
+
+# Outcomes of one upload attempt
+SENT = 'sent'
+RETRY = 'retry'
+REJECTED = 'rejected'
+
+
+class Uploader:
+    """Upload images to the dashboard with a pooled session and an offline spool"""
+
+    def __init__(self, url=DASHBOARD_URL, workers=4, detect=False, spool_dir=None,
+                 timeout=TIMEOUT, max_backoff=300, camera_id=None):
+        self.url = url
+        self.detect = detect
+        self.camera_id = camera_id
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.spool_dir = Path(spool_dir) if spool_dir else None
+        self.rejected_dir = self.spool_dir / 'rejected' if self.spool_dir else None
+        if self.spool_dir:
+            self.rejected_dir.mkdir(parents=True, exist_ok=True)
+
+        # One keep-alive connection per worker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='upload')
+
+    def upload(self, image_path, event_id=None):
+        """
+        Send an image file to the dashboard
+
+        Args:
+            image_path: Path to the image file (JPG, JPEG, or PNG)
+            event_id: ID that makes retries of this image idempotent
+
+        Returns:
+            True if the image was accepted. Images that could not be delivered
+            are spooled for retry when a spool directory is configured.
+        """
+        event_id = event_id or uuid.uuid4().hex
+        outcome = self.send(image_path, event_id)
+        if outcome == RETRY:
+            self.spool(image_path, event_id)
+        return outcome == SENT
+
+    def send(self, image_path, event_id):
+        """Make one upload attempt and return SENT, RETRY or REJECTED"""
+        image_path = Path(image_path)
+        mime_type = IMAGE_TYPES.get(image_path.suffix.lower())
+        if mime_type is None:
+            print(f"✗ Skipping {image_path.name}: unsupported image type")
+            return REJECTED
+
+        params = {'event_id': event_id}
+        if self.detect:
+            params['detect'] = '1'
+        if self.camera_id:
+            params['camera'] = self.camera_id
+
+        try:
+            with open(image_path, 'rb') as image_file:
+                response = self.session.post(
+                    self.url,
+                    data=image_file,
+                    params=params,
+                    headers={'Content-Type': mime_type},
+                    timeout=self.timeout
+                )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            print(f"✗ Dashboard unreachable for {image_path.name}: {e}")
+            return RETRY
+
+        if response.ok:
+            print(f"✓ {image_path.name} sent successfully")
+            return SENT
+
+        print(f"✗ Error for {image_path.name}: {response.status_code} - {response.text}")
+        if response.status_code >= 500 or response.status_code == 429:
+            # Server-side problem, worth retrying later
+            return RETRY
+        return REJECTED
+
+    def submit(self, image_path):
+        """Upload an image on the worker pool and return its future"""
+        return self.executor.submit(self.upload, image_path)
+
+    def spool(self, image_path, event_id):
+        """Keep a copy of an undelivered image, named by its event_id
+
+        The copy is written under a temporary name and renamed into place, so
+        the spool worker never sends a half-written image.
+        """
+        if self.spool_dir is None or Path(image_path).parent == self.spool_dir:
+            return
+        suffix = Path(image_path).suffix.lower()
+        partial = self.spool_dir / f".{event_id}{suffix}.part"
+        shutil.copy2(image_path, partial)
+        os.replace(partial, self.spool_dir / f"{event_id}{suffix}")
+        print(f"  ↻ Spooled {Path(image_path).name} for retry")
+
+    def flush_spool(self):
+        """Retry spooled images in order, stopping while the dashboard is unavailable
+
+        Images the dashboard rejects are moved to the rejected folder.
+        Returns True when the spool is empty.
+        """
+        if self.spool_dir is None:
+            return True
+
+        spooled_images = [path for path in self.spool_dir.iterdir()
+                          if path.is_file() and path.suffix.lower() in IMAGE_TYPES]
+        for spooled in sorted(spooled_images, key=lambda path: path.stat().st_mtime):
+            outcome = self.send(spooled, spooled.stem)
+            if outcome == RETRY:
+                return False
+            if outcome == REJECTED:
+                os.replace(spooled, self.rejected_dir / spooled.name)
+                print(f"  ✗ Moved {spooled.name} to {self.rejected_dir}")
+            else:
+                spooled.unlink()
+        return True
+
+    def run_spool_worker(self, stop_event):
+        """Flush the spool until stop_event is set, backing off while the dashboard is down"""
+        backoff = 1
+        while not stop_event.is_set():
+            if self.flush_spool():
+                backoff = 1
+            else:
+                backoff = min(backoff * 2, self.max_backoff)
+            # Jitter keeps a fleet of devices from retrying in lockstep
+            stop_event.wait(backoff * random.uniform(0.5, 1.0))
+
+    def watch(self, directory, interval=1.0, settle=0.5, stop_event=None):
+        """Upload new images that appear in a directory until stop_event is set
+
+        Files are picked up once they have not been modified for settle
+        seconds, so partially written images are not sent.
+        """
+        directory = Path(directory)
+        stop_event = stop_event or threading.Event()
+        seen = set()
+        print(f"Watching {directory} for new images (Ctrl+C to stop)")
+
+        while not stop_event.is_set():
+            now = time.time()
+            for path in directory.iterdir():
+                if path in seen or path.suffix.lower() not in IMAGE_TYPES:
+                    continue
+                if now - path.stat().st_mtime < settle:
+                    continue
+                seen.add(path)
+                self.submit(path)
+            stop_event.wait(interval)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
 
 def send_image_from_file(image_path):
     """
     Send an image file to the dashboard
-    
+
     Args:
         image_path: Path to the image file (JPG, JPEG, or PNG)
     """
+    uploader = Uploader(workers=1)
     try:
-        # Read the image file
-        with open(image_path, 'rb') as image_file:
-            # Encode to base64
-            image_data = base64.b64encode(image_file.read()).decode('utf-8')
-            
-        # Determine image type from extension
-        ext = Path(image_path).suffix.lower()
-        mime_type = 'image/jpeg' if ext in ['.jpg', '.jpeg'] else 'image/png'
-        
-        # Create data URI
-        data_uri = f"data:{mime_type};base64,{image_data}"
-        
-        # Send to dashboard
-        response = requests.post(
-            DASHBOARD_URL,
-            json={'image': data_uri},
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            print(f"✓ Image sent successfully at {result['timestamp']}")
-            return True
-        else:
-            print(f"✗ Error: {response.status_code} - {response.text}")
-            return False
-            
-    except Exception as e:
-        print(f"✗ Error sending image: {e}")
-        return False
+        return uploader.upload(image_path)
+    finally:
+        uploader.close()
 
 def send_base64_directly(base64_string):
     """
     Send a base64-encoded image directly
-    
+
     Args:
         base64_string: Base64-encoded image string (with or without data URI prefix)
     """
@@ -68,13 +232,14 @@ def send_base64_directly(base64_string):
         # Ensure proper format
         if not base64_string.startswith('data:image'):
             base64_string = f"data:image/jpeg;base64,{base64_string}"
-        
+
         response = requests.post(
             DASHBOARD_URL,
             json={'image': base64_string},
-            headers={'Content-Type': 'application/json'}
+            headers={'Content-Type': 'application/json'},
+            timeout=TIMEOUT
         )
-        
+
         if response.status_code == 200:
             result = response.json()
             print(f"✓ Image sent successfully at {result['timestamp']}")
@@ -82,35 +247,54 @@ def send_base64_directly(base64_string):
         else:
             print(f"✗ Error: {response.status_code} - {response.text}")
             return False
-            
+
     except Exception as e:
         print(f"✗ Error sending image: {e}")
         return False
 
 # Example usage
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Camera Client - Send image to dashboard")
-        print("=" * 50)
-        print("\nUsage: python camera_client_example.py <image_file>")
-        print("\nExample:")
-        print("  python camera_client_example.py photo.jpg")
-        print("  python camera_client_example.py C:\\path\\to\\image.png")
-        sys.exit(1)
-    
-    image_file = sys.argv[1]
-    
-    # Check if file exists
-    if not Path(image_file).exists():
-        print(f"✗ Error: File '{image_file}' not found")
-        sys.exit(1)
-    
-    print(f"Sending image: {image_file}")
-    print("-" * 50)
-    
-    if send_image_from_file(image_file):
-        print("\n✓ Image successfully broadcast to all dashboard viewers!")
-        sys.exit(0)
-    else:
-        print("\n✗ Failed to send image")
+    parser = argparse.ArgumentParser(description="Camera Client - Send images to the dashboard")
+    parser.add_argument('images', nargs='*', help="Image files to send")
+    parser.add_argument('--watch', metavar='DIR', help="Upload new images that appear in DIR")
+    parser.add_argument('--url', default=DASHBOARD_URL, help="Camera feed endpoint")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent uploads")
+    parser.add_argument('--detect', action='store_true', help="Classify and log each image")
+    parser.add_argument('--spool', metavar='DIR', help="Keep undelivered images in DIR and retry them")
+    parser.add_argument('--camera', help="Camera ID to upload to (default: the dashboard's first camera)")
+    args = parser.parse_args()
+
+    if not args.images and not args.watch:
+        parser.print_help()
         sys.exit(1)
+
+    for image_file in args.images:
+        # Check if file exists
+        if not Path(image_file).exists():
+            print(f"✗ Error: File '{image_file}' not found")
+            sys.exit(1)
+
+    uploader = Uploader(url=args.url, workers=args.workers, detect=args.detect, spool_dir=args.spool,
+                        camera_id=args.camera)
+    stop_event = threading.Event()
+    spool_thread = None
+    if args.spool:
+        spool_thread = threading.Thread(target=uploader.run_spool_worker, args=(stop_event,), daemon=True)
+        spool_thread.start()
+
+    try:
+        if args.watch:
+            uploader.watch(args.watch, stop_event=stop_event)
+        else:
+            print(f"Sending {len(args.images)} image(s)")
+            print("-" * 50)
+            futures = [uploader.submit(image_file) for image_file in args.images]
+            sent = sum(future.result() for future in futures)
+            print(f"\n{'✓' if sent == len(futures) else '✗'} {sent}/{len(futures)} images sent")
+            if sent < len(futures):
+                sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        uploader.close()
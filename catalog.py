@@ -0,0 +1,236 @@
+"""
+Canonical product and brand names for the trash logs
+
+Users and the vision model spell the same product many ways ("Plastic
+Bottle", "plastic bottles", "Coca-Cola", "Coca Cola"). Every name written
+to trash_logs is matched to an entry of the products or brands table and
+the log stores the integer ID next to the name as given, so statistics
+group by integers and near-duplicate spellings count together.
+
+A name matches an entry when its key (lower case, punctuation dropped,
+single spaces) is the same, or close enough by difflib ratio
+(CATALOG_MATCH_CUTOFF, default 0.88). A close key only counts when it has
+the same number of words, words with digits (sizes such as "500ml") are
+equal and every other word is itself close, so "Plastic Cap" does not
+match "Plastic Cup" and "Green Tea Bottle Cap" does not match "Green Tea
+Bottle". Names that match nothing become new entries.
+
+The entries are cached in memory, bucketed by word count, words with
+digits and key length, so the fuzzy search only compares a name with keys
+that could pass these checks. Entries added inside a transaction are only
+cached once it has committed (see sync()), so a rolled-back write never
+leaves an unknown ID in the cache.
+
+Usage:
+    python catalog.py show [--limit 20]
+    python catalog.py backfill
+"""
+import argparse
+import difflib
+import math
+import os
+import re
+import threading
+from lru import LRUCache
+
+CATALOG_MATCH_CUTOFF = float(os.getenv("CATALOG_MATCH_CUTOFF", "0.88"))
+# Misspellings already matched to an entry, so they skip the fuzzy search
+ALIAS_CACHE_SIZE = 10000
+# Close keys checked word by word for each name
+MATCH_CANDIDATES = 5
+
+def normalize(name):
+    """Matching key of a name: lower case, punctuation dropped, single spaces"""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', name.lower()).split())
+
+def signature(key):
+    """Word count and positioned words with digits, which close keys must share"""
+    words = key.split()
+    return len(words), tuple((i, word) for i, word in enumerate(words) if any(char.isdigit() for char in word))
+
+def length_range(length, cutoff=CATALOG_MATCH_CUTOFF):
+    """Key lengths whose difflib ratio with a key of this length can reach cutoff"""
+    # The margin keeps float rounding from dropping a length exactly at the cutoff
+    return range(math.ceil(length * cutoff / (2 - cutoff) - 1e-9),
+                 math.floor(length * (2 - cutoff) / cutoff + 1e-9) + 1)
+
+def same_words(key, other, cutoff=CATALOG_MATCH_CUTOFF):
+    """Whether two close keys differ only by misspelled words
+
+    Both keys need the same number of words. Words with digits must be
+    equal, and each other pair of words must be close by difflib ratio.
+    """
+    words, other_words = key.split(), other.split()
+    if len(words) != len(other_words):
+        return False
+    for word, other_word in zip(words, other_words):
+        if word == other_word:
+            continue
+        if any(char.isdigit() for char in word + other_word):
+            return False
+        if difflib.SequenceMatcher(None, word, other_word).ratio() < cutoff:
+            return False
+    return True
+
+
+class Catalog:
+    """Canonical names of one table (products or brands) with an in-memory cache"""
+
+    def __init__(self, table, cutoff=CATALOG_MATCH_CUTOFF):
+        self.table = table
+        self.cutoff = cutoff
+        self._ids = {}
+        # signature -> key length -> keys
+        self._buckets = {}
+        self._aliases = LRUCache(maxsize=ALIAS_CACHE_SIZE)
+        self._last_id = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def sync(self, conn):
+        """Cache the committed entries added since the last sync"""
+        with self._lock:
+            rows = conn.execute(f'SELECT id, key FROM {self.table} WHERE id > ? ORDER BY id',
+                                (self._last_id,)).fetchall()
+            for entry_id, key in rows:
+                if key not in self._ids:
+                    self._buckets.setdefault(signature(key), {}).setdefault(len(key), []).append(key)
+                self._ids[key] = entry_id
+                self._last_id = entry_id
+            self._loaded = True
+
+    def match(self, key, pending):
+        """Find the ID of an entry with the same or a close key, or None"""
+        key_signature = signature(key)
+        lengths = length_range(len(key), self.cutoff)
+        with self._lock:
+            entry_id = self._ids.get(key)
+            bucket = self._buckets.get(key_signature, {})
+            candidates = [] if entry_id is not None else [
+                other for length in lengths for other in bucket.get(length, ())]
+        if entry_id is not None:
+            return entry_id
+        if key in pending:
+            return pending[key]
+        entry_id = self._aliases.get(key)
+        if entry_id is not None:
+            return entry_id
+
+        candidates += [other for other in pending
+                       if len(other) in lengths and signature(other) == key_signature]
+        matches = difflib.get_close_matches(key, candidates, n=MATCH_CANDIDATES, cutoff=self.cutoff)
+        match = next((other for other in matches if same_words(key, other, self.cutoff)), None)
+        if match is None:
+            return None
+        if match in pending:
+            return pending[match]
+        entry_id = self._ids[match]
+        self._aliases.put(key, entry_id)
+        return entry_id
+
+    def resolve(self, conn, name, pending=None):
+        """Get the ID of the entry for a name, adding an entry if none is close
+
+        Runs inside the caller's transaction. pending maps the keys of
+        entries added earlier in that transaction to their IDs and is
+        updated with new ones. Returns None for empty names.
+        """
+        key = normalize(name) if name else ''
+        if not key:
+            return None
+        if not self._loaded:
+            self.sync(conn)
+        if pending is None:
+            pending = {}
+
+        entry_id = self.match(key, pending)
+        if entry_id is None:
+            # Another writer may have added the same key since the last sync
+            conn.execute(f'INSERT INTO {self.table} (name, key) VALUES (?, ?) ON CONFLICT (key) DO NOTHING',
+                         (name.strip(), key))
+            entry_id = conn.execute(f'SELECT id FROM {self.table} WHERE key = ?', (key,)).fetchone()[0]
+            pending[key] = entry_id
+        return entry_id
+
+
+products = Catalog('products')
+brands = Catalog('brands')
+
+def resolve_items(conn, items):
+    """Get the (product_id, brand_id) of each ingest item, inside the caller's transaction"""
+    pending_products = {}
+    pending_brands = {}
+    return [(products.resolve(conn, item['product'], pending_products),
+             brands.resolve(conn, item['brand'], pending_brands))
+            for item in items]
+
+def sync(conn):
+    """Cache the entries of both tables committed since the last sync"""
+    products.sync(conn)
+    brands.sync(conn)
+
+def backfill(conn):
+    """Give the logs written before the catalog existed their product and brand IDs
+
+    Each distinct name is resolved once; the logs are then updated with one
+    statement per column. Their names are kept as they were. Runs inside the
+    caller's transaction. Returns the number of IDs set.
+    """
+    updated = 0
+    for entries, column in ((products, 'product'), (brands, 'brand')):
+        names = [row[0] for row in conn.execute(f'''
+            SELECT DISTINCT {column} FROM trash_logs
+            WHERE {column}_id IS NULL AND {column} IS NOT NULL
+        ''').fetchall()]
+
+        pending = {}
+        mapping = [(name, entries.resolve(conn, name, pending)) for name in names]
+
+        conn.execute('DROP TABLE IF EXISTS temp.backfill_names')
+        conn.execute('CREATE TEMP TABLE backfill_names (name TEXT PRIMARY KEY, entry_id INTEGER)')
+        conn.executemany('INSERT INTO backfill_names VALUES (?, ?)', mapping)
+        updated += conn.execute(f'''
+            UPDATE trash_logs
+            SET {column}_id = (SELECT entry_id FROM backfill_names WHERE name = trash_logs.{column})
+            WHERE {column}_id IS NULL AND {column} IS NOT NULL
+        ''').rowcount
+        conn.execute('DROP TABLE temp.backfill_names')
+
+    return updated
+
+def main():
+    from database import get_db_connection, init_db
+
+    parser = argparse.ArgumentParser(description='Manage the canonical product and brand names')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    show_parser = subparsers.add_parser('show', help='Print the most logged products and brands')
+    show_parser.add_argument('--limit', type=int, default=20)
+    subparsers.add_parser('backfill', help='Set product and brand IDs on logs written before the catalog')
+    args = parser.parse_args()
+
+    init_db()
+    conn = get_db_connection()
+    try:
+        if args.command == 'show':
+            for table, column in (('products', 'product_id'), ('brands', 'brand_id')):
+                total = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                print(f"{table.capitalize()} ({total})")
+                rows = conn.execute(f'''
+                    SELECT t.id, t.name, COUNT(l.id) AS items
+                    FROM {table} t
+                    LEFT JOIN trash_logs l ON l.{column} = t.id
+                    GROUP BY t.id
+                    ORDER BY items DESC, t.name
+                    LIMIT ?
+                ''', (args.limit,)).fetchall()
+                for row in rows:
+                    print(f"  {row['id']:>6}  {row['name']:<40} {row['items']:>7} items")
+        else:
+            updated = backfill(conn)
+            conn.commit()
+            print(f"✓ Set {updated} product and brand IDs in the logs")
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""
+Vision model classification of trash items (sync and async clients)
+
+PROMPT_MODE selects the prompt:
+    full     the original prose prompt, sent with every image
+    compact  short instructions and short output keys that are mapped back to
+             the Out fields, so each call sends fewer input tokens. The
+             prompt is far below the 1024 tokens the API needs before it
+             caches a prefix, so neither mode gets cached tokens
+
+Every call records its token usage and latency under "usage" in the result.
+
+classify() and classify_async() go through a resilience layer: a deadline
+per detection (CLASSIFY_DEADLINE), a timeout per attempt (CLASSIFY_TIMEOUT),
+bounded retries with jitter (CLASSIFY_RETRIES), a limit on calls in flight
+(CLASSIFY_CONCURRENCY) and a circuit breaker. While the breaker is open,
+images that were classified before get their cached result and others fail
+fast with resilience.Unavailable.
+
+openai and pydantic make up most of the app's import time, so they are
+imported, and the clients built, when the first image is classified (see
+backend()).
+"""
+import hashlib
+import os
+import threading
+import time
+from types import SimpleNamespace
+from dotenv import load_dotenv
+from materials import id_to_material
+import resilience
+
+load_dotenv()
+
+text_prompt = """
+Your task is to peform closed-set object classification based on a list of categories and open-set object classification to identify what the item is. For context, the items shown in the image are common trash items.
+
+Categories for closed-set object classification are: 
+1. Glass 
+2. Paper 
+3. Plastic 
+4. Metal 
+5. Cardboard 
+6. Biodegradable 
+
+Please give the output in the format of [(Categorical ID, Item description, Brand name, Weight, Volume, Recyclableness)], for example:
+[(3, Plastic Bottle, Namthip, 7, 500, Yes), (2, Paper Shopping Bag, Zurich Duty Free Shopping Bag, 30, 1500, Yes), (1, Glass Soda Bottle, Chang, 150, 500, Yes)]
+
+Do not provide any reasonings.
+
+Things to note:
+We are located in Bangkok, Thailand.
+For the brand name, try to find the product brand visually. If it is unbranded or unidentifiable, use the most common brand that produces this item in Bangkok, Thailand.
+For the weight in grams, output a single number in integer format and try to come up with an estimate by making several assumptions from the object semantic description, relative size and material (e.g. average weight of a shopping bag is 6 grams).
+For the volume in millilitres, output a number in integer format and try to come up with an estimate by making several assumptions from the object semantic description, relative size and material
+For the confidence, output a number between 0 and 1 for how certain you are of the categorical ID
+"""
+
+# The compact prompt relies on the structured output schema for the format
+compact_instructions = """Classify each trash item in the image. We are in Bangkok, Thailand. No reasoning.
+m: category ID, 1 Glass, 2 Paper, 3 Plastic, 4 Metal, 5 Cardboard, 6 Biodegradable
+d: short item description
+b: brand seen on the item, else the most common Bangkok brand for it
+g: estimated weight in grams
+ml: estimated volume in millilitres
+r: recyclable
+c: confidence in m, 0 to 1
+"""
+
+MODEL = "gpt-5.1"
+PROMPT_MODES = ('full', 'compact')
+PROMPT_MODE = os.getenv("PROMPT_MODE", "full")
+# "low" costs a fixed, small number of image tokens; "auto" lets the model pick
+IMAGE_DETAIL = os.getenv("IMAGE_DETAIL", "auto")
+
+CLASSIFY_DEADLINE = float(os.getenv("CLASSIFY_DEADLINE", "45"))
+CLASSIFY_TIMEOUT = float(os.getenv("CLASSIFY_TIMEOUT", "20"))
+CLASSIFY_RETRIES = int(os.getenv("CLASSIFY_RETRIES", "2"))
+CLASSIFY_CONCURRENCY = int(os.getenv("CLASSIFY_CONCURRENCY", "8"))
+CLASSIFY_BREAKER_COOLDOWN = float(os.getenv("CLASSIFY_BREAKER_COOLDOWN", "30"))
+
+
+COMPACT_FIELDS = {
+    'm': 'id',
+    'd': 'item_description',
+    'b': 'brand_name',
+    'g': 'weight',
+    'ml': 'volume',
+    'r': 'recyclable',
+    'c': 'confidence'
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def _build_backend():
+    import openai
+    from pydantic import BaseModel
+
+    class Out(BaseModel):
+        id: int
+        item_description: str
+        brand_name: str
+        weight: int
+        volume : int
+        recyclable: bool
+        confidence: float
+    class ModelOutput(BaseModel):
+        out : list[Out]
+
+    class CompactOut(BaseModel):
+        m: int
+        d: str
+        b: str
+        g: int
+        ml: int
+        r: bool
+        c: float
+    class CompactModelOutput(BaseModel):
+        out : list[CompactOut]
+
+    return SimpleNamespace(
+        ModelOutput=ModelOutput,
+        CompactModelOutput=CompactModelOutput,
+        # Retries are left to the resilience layer, which knows the overall deadline
+        client=openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0),
+        async_client=openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0),
+        guard=resilience.Resilient(
+            'classifier',
+            retryable=(openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError),
+            deadline=CLASSIFY_DEADLINE,
+            attempt_timeout=CLASSIFY_TIMEOUT,
+            retries=CLASSIFY_RETRIES,
+            concurrency=CLASSIFY_CONCURRENCY,
+            breaker=resilience.CircuitBreaker(cooldown=CLASSIFY_BREAKER_COOLDOWN)
+        )
+    )
+
+def backend():
+    """The output schemas, OpenAI clients and resilience guard, built on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _build_backend()
+    return _backend
+
+def build_input(b64_str, mode=None):
+    """Build the model input for a single base64 image"""
+    image = {"type": "input_image", "image_url": b64_str, "detail": IMAGE_DETAIL}
+    if (mode or PROMPT_MODE) == 'compact':
+        return [{"role": "user", "content": [image]}]
+
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "input_text", "text": text_prompt},
+                image,
+            ],
+        }
+    ]
+
+def build_request(b64_str, mode=None):
+    """Build the responses.parse arguments for an image"""
+    mode = mode or PROMPT_MODE
+    if mode not in PROMPT_MODES:
+        raise ValueError(f"Unknown prompt mode: {mode}")
+
+    request = {
+        "model": MODEL,
+        "input": build_input(b64_str, mode),
+        "text_format": backend().ModelOutput
+    }
+    if mode == 'compact':
+        request["instructions"] = compact_instructions
+        request["text_format"] = backend().CompactModelOutput
+    return request
+
+def parse_output(response, mode=None, latency=None):
+    """Convert a parsed model response into a dict with material names and usage"""
+    resp_dict = response.output_parsed.model_dump()
+    if (mode or PROMPT_MODE) == 'compact':
+        resp_dict["out"] = [{COMPACT_FIELDS[key]: value for key, value in out.items()}
+                            for out in resp_dict["out"]]
+    for out in resp_dict["out"]:
+        out["material"] = id_to_material[out["id"]]
+
+    usage = response.usage
+    details = getattr(usage, "input_tokens_details", None)
+    resp_dict["usage"] = {
+        "prompt_mode": mode or PROMPT_MODE,
+        "model": MODEL,
+        "input_tokens": usage.input_tokens if usage else None,
+        "cached_tokens": details.cached_tokens if details else None,
+        "output_tokens": usage.output_tokens if usage else None,
+        "latency_ms": round(latency * 1000, 1) if latency is not None else None
+    }
+    return resp_dict
+
+def create_response(b64_str, mode=None, timeout=None):
+    """Classify the items in an image (blocking, one attempt)"""
+    client = backend().client
+    request_client = client.with_options(timeout=timeout) if timeout else client
+    started = time.monotonic()
+    response = request_client.responses.parse(**build_request(b64_str, mode))
+    return parse_output(response, mode, time.monotonic() - started)
+
+async def create_response_async(b64_str, mode=None, timeout=None):
+    """Classify the items in an image without blocking the event loop (one attempt)"""
+    async_client = backend().async_client
+    request_client = async_client.with_options(timeout=timeout) if timeout else async_client
+    started = time.monotonic()
+    response = await request_client.responses.parse(**build_request(b64_str, mode))
+    return parse_output(response, mode, time.monotonic() - started)
+
+def image_key(b64_str, mode=None):
+    """Cache key of an image for the fallback result"""
+    return hashlib.sha256(f"{mode or PROMPT_MODE}:{b64_str}".encode()).hexdigest()
+
+def without_usage_if_cached(resp_dict):
+    """Cached fallback results made no call, so they carry no usage to record"""
+    if resp_dict.get("fallback"):
+        resp_dict["usage"] = None
+    return resp_dict
+
+def classify(b64_str, mode=None):
+    """Classify an image with deadlines, retries and the circuit breaker (blocking)"""
+    return without_usage_if_cached(backend().guard.call(image_key(b64_str, mode), create_response, b64_str, mode))
+
+async def classify_async(b64_str, mode=None):
+    """Classify an image with deadlines, retries and the circuit breaker"""
+    resp_dict = await backend().guard.call_async(image_key(b64_str, mode), create_response_async, b64_str, mode)
+    return without_usage_if_cached(resp_dict)
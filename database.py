@@ -0,0 +1,241 @@
+"""
+Database connection and schema setup shared by the Flask and ASGI apps
+"""
+import sqlite3
+import catalog
+import emissions
+
+DATABASE = 'trashbin.db'
+
+def get_db_connection():
+    """Create a database connection"""
+    conn = sqlite3.connect(DATABASE)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_db():
+    """Initialize the database with tables"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    # Create trashbin_status table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS trashbin_status (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            normal_volume REAL DEFAULT 0,
+            normal_weight REAL DEFAULT 0,
+            recycle_volume REAL DEFAULT 0,
+            recycle_weight REAL DEFAULT 0,
+            normal_capacity REAL DEFAULT 100,
+            recycle_capacity REAL DEFAULT 100,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Create trash_logs table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS trash_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            waste_type TEXT NOT NULL,
+            volume REAL NOT NULL,
+            weight REAL NOT NULL,
+            brand TEXT,
+            product TEXT,
+            event_type TEXT DEFAULT 'add',
+            co2_emissions REAL DEFAULT 0,
+            factor_version INTEGER,
+            material_id INTEGER,
+            confidence REAL,
+            source TEXT,
+            product_id INTEGER REFERENCES products (id),
+            brand_id INTEGER REFERENCES brands (id),
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Create products and brands tables with the canonical names logs refer to
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            key TEXT NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS brands (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            key TEXT NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Create emissions_summary table for Scope 3 tracking
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS emissions_summary (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            total_co2_landfill REAL DEFAULT 0,
+            total_co2_recycling REAL DEFAULT 0,
+            total_co2_avoided REAL DEFAULT 0,
+            net_co2_emissions REAL DEFAULT 0,
+            total_waste_diverted REAL DEFAULT 0,
+            factor_version INTEGER,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Create emission_factors table with versioned per-material factors
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS emission_factors (
+            version INTEGER NOT NULL,
+            material_id INTEGER NOT NULL,
+            landfill REAL NOT NULL,
+            recycling REAL NOT NULL,
+            avoided REAL NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (version, material_id)
+        )
+    ''')
+
+    # Create material_emissions rollup of emptied weight and CO2 per material
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS material_emissions (
+            material_id INTEGER NOT NULL,
+            waste_type TEXT NOT NULL,
+            weight_emptied REAL DEFAULT 0,
+            co2_landfill REAL DEFAULT 0,
+            co2_recycling REAL DEFAULT 0,
+            co2_avoided REAL DEFAULT 0,
+            net_co2_emissions REAL DEFAULT 0,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (material_id, waste_type)
+        )
+    ''')
+
+    # Create ingest_events table so retried ingest requests are applied once
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_events (
+            event_id TEXT PRIMARY KEY,
+            endpoint TEXT NOT NULL,
+            response TEXT NOT NULL,
+            status_code INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Create classifier_calls table with token usage and latency per vision model call
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS classifier_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prompt_mode TEXT NOT NULL,
+            model TEXT NOT NULL,
+            input_tokens INTEGER,
+            cached_tokens INTEGER,
+            output_tokens INTEGER,
+            latency_ms REAL,
+            items INTEGER NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Add event_type column if it doesn't exist (migration)
+    try:
+        cursor.execute("SELECT event_type FROM trash_logs LIMIT 1")
+    except sqlite3.OperationalError:
+        cursor.execute("ALTER TABLE trash_logs ADD COLUMN event_type TEXT DEFAULT 'add'")
+
+    # Add co2_emissions column if it doesn't exist (migration)
+    try:
+        cursor.execute("SELECT co2_emissions FROM trash_logs LIMIT 1")
+    except sqlite3.OperationalError:
+        cursor.execute("ALTER TABLE trash_logs ADD COLUMN co2_emissions REAL DEFAULT 0")
+
+    # Add brand column if it doesn't exist (migration)
+    try:
+        cursor.execute("SELECT brand FROM trash_logs LIMIT 1")
+    except sqlite3.OperationalError:
+        cursor.execute("ALTER TABLE trash_logs ADD COLUMN brand TEXT")
+
+    # Add product column if it doesn't exist (migration)
+    try:
+        cursor.execute("SELECT product FROM trash_logs LIMIT 1")
+    except sqlite3.OperationalError:
+        cursor.execute("ALTER TABLE trash_logs ADD COLUMN product TEXT")
+
+    # Add factor_version columns if they don't exist (migration)
+    try:
+        cursor.execute("SELECT factor_version FROM trash_logs LIMIT 1")
+    except sqlite3.OperationalError:
+        cursor.execute("ALTER TABLE trash_logs ADD COLUMN factor_version INTEGER")
+
+    try:
+        cursor.execute("SELECT factor_version FROM emissions_summary LIMIT 1")
+    except sqlite3.OperationalError:
+        cursor.execute("ALTER TABLE emissions_summary ADD COLUMN factor_version INTEGER")
+
+    # Add material tracking columns if they don't exist (migration)
+    try:
+        cursor.execute("SELECT material_id FROM trash_logs LIMIT 1")
+    except sqlite3.OperationalError:
+        cursor.execute("ALTER TABLE trash_logs ADD COLUMN material_id INTEGER")
+
+    try:
+        cursor.execute("SELECT confidence FROM trash_logs LIMIT 1")
+    except sqlite3.OperationalError:
+        cursor.execute("ALTER TABLE trash_logs ADD COLUMN confidence REAL")
+
+    try:
+        cursor.execute("SELECT source FROM trash_logs LIMIT 1")
+    except sqlite3.OperationalError:
+        cursor.execute("ALTER TABLE trash_logs ADD COLUMN source TEXT")
+
+    # Add product and brand ID columns if they don't exist (migration; old logs get their
+    # IDs from `python catalog.py backfill`)
+    try:
+        cursor.execute("SELECT product_id, brand_id FROM trash_logs LIMIT 1")
+    except sqlite3.OperationalError:
+        cursor.execute("ALTER TABLE trash_logs ADD COLUMN product_id INTEGER REFERENCES products (id)")
+        cursor.execute("ALTER TABLE trash_logs ADD COLUMN brand_id INTEGER REFERENCES brands (id)")
+
+    # Per-material weight queries and the bin composition lookup on empty
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_trash_logs_material ON trash_logs (event_type, material_id, weight)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_trash_logs_event ON trash_logs (event_type, waste_type)')
+    # Covers the product statistics, so they are computed from the index alone
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_trash_logs_product
+        ON trash_logs (event_type, product_id, brand_id, waste_type, weight, co2_emissions)
+    ''')
+
+    # Insert default emissions factors if not exists
+    if emissions.latest_version(cursor) is None:
+        emissions.add_factor_version(cursor, {'Mixed': emissions.DEFAULT_FACTORS},
+                                     'EPA and industry standards')
+
+    # Insert initial status if not exists
+    cursor.execute('SELECT COUNT(*) FROM trashbin_status')
+    if cursor.fetchone()[0] == 0:
+        cursor.execute('''
+            INSERT INTO trashbin_status
+            (normal_volume, normal_weight, recycle_volume, recycle_weight,
+             normal_capacity, recycle_capacity)
+            VALUES (0, 0, 0, 0, 100, 100)
+        ''')
+
+    # Insert initial emissions summary if not exists
+    cursor.execute('SELECT COUNT(*) FROM emissions_summary')
+    if cursor.fetchone()[0] == 0:
+        cursor.execute('''
+            INSERT INTO emissions_summary
+            (total_co2_landfill, total_co2_recycling, total_co2_avoided,
+             net_co2_emissions, total_waste_diverted)
+            VALUES (0, 0, 0, 0, 0)
+        ''')
+
+    conn.commit()
+
+    # Load the canonical product and brand names for matching
+    catalog.sync(conn)
+    conn.close()
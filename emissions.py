@@ -0,0 +1,347 @@
+"""
+Scope 3 emissions engine with versioned, per-material factor tables
+
+Factors are stored in the emission_factors table, one row per (version,
+material). Empty events are split by the materials added since the bin was
+last emptied and charged with the latest version in the same transaction
+that logs them. backfill() recomputes every historical empty event, the
+per-material rollup and the emissions summary for any version in one pass.
+
+Usage:
+    python emissions.py show [--version N]
+    python emissions.py add-version factors.json
+    python emissions.py backfill [--version N]
+"""
+import argparse
+import json
+from materials import MIXED_MATERIAL_ID, id_to_material, material_id_from_name, material_name
+
+FACTOR_NAMES = ('landfill', 'recycling', 'avoided')
+
+# Scope 3 Emissions Factors (kg CO2e per kg of waste)
+# Based on EPA and industry standards
+DEFAULT_FACTORS = {
+    'landfill': 0.5,  # kg CO2e per kg waste to landfill
+    'recycling': 0.1,  # kg CO2e per kg recycling process
+    'avoided': 2.0,   # kg CO2e avoided per kg recycled (avoided production emissions)
+}
+
+def latest_version(conn):
+    """Get the newest factor table version, or None if there are none"""
+    return conn.execute('SELECT MAX(version) FROM emission_factors').fetchone()[0]
+
+def load_factors(conn, version=None):
+    """Load a factor table as (version, {material_id: {factor_name: value}})"""
+    if version is None:
+        version = latest_version(conn)
+
+    rows = conn.execute('''
+        SELECT material_id, landfill, recycling, avoided
+        FROM emission_factors
+        WHERE version = ?
+    ''', (version,)).fetchall()
+
+    if not rows:
+        raise ValueError(f'Unknown emissions factor version: {version}')
+
+    return version, {row[0]: dict(zip(FACTOR_NAMES, row[1:])) for row in rows}
+
+def add_factor_version(conn, factors, description=None):
+    """Store a new factor table and return its version number
+
+    factors maps material IDs or names (including "Mixed") to a dict of
+    landfill/recycling/avoided factors. Materials that are left out use the
+    Mixed entry, which is required.
+    """
+    resolved = {}
+    for key, values in factors.items():
+        material_id = key if isinstance(key, int) else material_id_from_name(key)
+        if material_id is None:
+            raise ValueError(f'Unknown material: {key}')
+        resolved[material_id] = {name: float(values[name]) for name in FACTOR_NAMES}
+
+    if MIXED_MATERIAL_ID not in resolved:
+        raise ValueError('Factor table must include a "Mixed" entry')
+
+    version = (latest_version(conn) or 0) + 1
+    rows = []
+    for material_id in [MIXED_MATERIAL_ID, *id_to_material]:
+        values = resolved.get(material_id, resolved[MIXED_MATERIAL_ID])
+        rows.append((version, material_id, *(values[name] for name in FACTOR_NAMES), description))
+
+    conn.executemany('''
+        INSERT INTO emission_factors (version, material_id, landfill, recycling, avoided, description)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows)
+    return version
+
+def load_factor_file(path):
+    """Read a factor table from JSON: {"description": ..., "factors": {material: {...}}}"""
+    with open(path) as f:
+        data = json.load(f)
+    return data['factors'], data.get('description')
+
+def calculate_emissions(composition, waste_type, factors):
+    """Calculate the Scope 3 emissions of emptying a bin
+
+    composition maps material IDs to weight in kg. Returns the landfill,
+    recycling process and avoided CO2 plus the net impact, all in kg, with
+    the same breakdown per material under 'materials'.
+    """
+    totals = {'landfill': 0.0, 'recycling': 0.0, 'avoided': 0.0, 'net': 0.0, 'materials': {}}
+    for material_id, weight in composition.items():
+        material_factors = factors.get(material_id, factors[MIXED_MATERIAL_ID])
+        co2 = {'weight': weight, 'landfill': 0.0, 'recycling': 0.0, 'avoided': 0.0}
+        if waste_type == 'normal':
+            # Normal waste goes to landfill
+            co2['landfill'] = weight * material_factors['landfill']
+        else:  # recycle
+            # Recycling has processing emissions but avoids production emissions
+            co2['recycling'] = weight * material_factors['recycling']
+            co2['avoided'] = weight * material_factors['avoided']
+        co2['net'] = co2['landfill'] + co2['recycling'] - co2['avoided']
+
+        totals['materials'][material_id] = co2
+        for name in ('landfill', 'recycling', 'avoided', 'net'):
+            totals[name] += co2[name]
+
+    return totals
+
+def bin_composition(conn, waste_type, weight):
+    """Split the weight being emptied from a bin by material
+
+    Uses the items added since the bin was last emptied, scaled to the
+    emptied weight. Items without a material count as mixed.
+    """
+    rows = conn.execute('''
+        SELECT COALESCE(material_id, ?), SUM(weight)
+        FROM trash_logs
+        WHERE event_type = 'add' AND waste_type = ?
+          AND id > (SELECT COALESCE(MAX(id), 0) FROM trash_logs
+                    WHERE event_type = 'empty' AND waste_type = ?)
+        GROUP BY 1
+    ''', (MIXED_MATERIAL_ID, waste_type, waste_type)).fetchall()
+
+    added = sum(row[1] for row in rows)
+    if added <= 0:
+        return {MIXED_MATERIAL_ID: weight}
+    return {row[0]: weight * row[1] / added for row in rows}
+
+def record_empty(conn, waste_type, volume, weight, composition=None, timestamp=None):
+    """Log an empty event and add its emissions to the summary
+
+    Runs inside the caller's transaction; the caller commits. composition
+    defaults to the materials added since the bin was last emptied.
+    """
+    version, factors = load_factors(conn)
+    if composition is None:
+        composition = bin_composition(conn, waste_type, weight)
+    co2 = calculate_emissions(composition, waste_type, factors)
+
+    conn.execute('''
+        INSERT INTO trash_logs (waste_type, volume, weight, event_type, co2_emissions, factor_version, timestamp)
+        VALUES (?, ?, ?, 'empty', ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+    ''', (waste_type, volume, weight, co2['net'], version, timestamp))
+
+    conn.execute('''
+        UPDATE emissions_summary
+        SET total_co2_landfill = total_co2_landfill + ?,
+            total_co2_recycling = total_co2_recycling + ?,
+            total_co2_avoided = total_co2_avoided + ?,
+            net_co2_emissions = net_co2_emissions + ?,
+            total_waste_diverted = total_waste_diverted + ?,
+            factor_version = ?,
+            last_updated = COALESCE(?, CURRENT_TIMESTAMP)
+        WHERE id = (SELECT MAX(id) FROM emissions_summary)
+    ''', (co2['landfill'], co2['recycling'], co2['avoided'], co2['net'],
+          weight if waste_type == 'recycle' else 0, version, timestamp))
+
+    conn.executemany('''
+        INSERT INTO material_emissions
+        (material_id, waste_type, weight_emptied, co2_landfill, co2_recycling,
+         co2_avoided, net_co2_emissions, last_updated)
+        VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+        ON CONFLICT (material_id, waste_type) DO UPDATE SET
+            weight_emptied = weight_emptied + excluded.weight_emptied,
+            co2_landfill = co2_landfill + excluded.co2_landfill,
+            co2_recycling = co2_recycling + excluded.co2_recycling,
+            co2_avoided = co2_avoided + excluded.co2_avoided,
+            net_co2_emissions = net_co2_emissions + excluded.net_co2_emissions,
+            last_updated = excluded.last_updated
+    ''', [(material_id, waste_type, material['weight'], material['landfill'],
+           material['recycling'], material['avoided'], material['net'], timestamp)
+          for material_id, material in co2['materials'].items()])
+
+    return co2
+
+def backfill(conn, version=None):
+    """Recompute co2_emissions of every empty event and the emissions rollups
+
+    Each empty event is split by the materials added since the previous empty
+    of the same bin, exactly like record_empty. Everything is done with
+    set-based statements over temporary tables, so millions of rows are
+    rewritten in a single pass inside one transaction. Returns the number of
+    empty events updated.
+    """
+    version, factors = load_factors(conn, version)
+
+    conn.execute('DROP TABLE IF EXISTS temp.backfill_factors')
+    conn.execute('DROP TABLE IF EXISTS temp.backfill_composition')
+    conn.execute('DROP TABLE IF EXISTS temp.backfill_co2')
+
+    conn.execute('''
+        CREATE TEMP TABLE backfill_factors (
+            material_id INTEGER PRIMARY KEY,
+            landfill REAL, recycling REAL, avoided REAL
+        )
+    ''')
+    conn.executemany('INSERT INTO backfill_factors VALUES (?, ?, ?, ?)',
+                     [(material_id, *(values[name] for name in FACTOR_NAMES))
+                      for material_id, values in factors.items()])
+
+    # Typed columns, so the indexes on empty_id are used for the joins below
+    conn.execute('''
+        CREATE TEMP TABLE backfill_composition (
+            empty_id INTEGER NOT NULL,
+            material_id INTEGER NOT NULL,
+            weight REAL
+        )
+    ''')
+    conn.execute('''
+        CREATE TEMP TABLE backfill_co2 (
+            empty_id INTEGER NOT NULL,
+            material_id INTEGER NOT NULL,
+            waste_type TEXT NOT NULL,
+            weight REAL,
+            co2_landfill REAL,
+            co2_recycling REAL,
+            co2_avoided REAL
+        )
+    ''')
+
+    # Assign every added item to the empty event that removed it
+    conn.execute('''
+        INSERT INTO backfill_composition (empty_id, material_id, weight)
+        SELECT empty_id, material_id, SUM(weight)
+        FROM (
+            SELECT COALESCE(a.material_id, ?) AS material_id, a.weight,
+                   (SELECT MIN(e.id) FROM trash_logs e
+                    WHERE e.event_type = 'empty' AND e.waste_type = a.waste_type
+                      AND e.id > a.id) AS empty_id
+            FROM trash_logs a
+            WHERE a.event_type = 'add'
+        )
+        WHERE empty_id IS NOT NULL
+        GROUP BY empty_id, material_id
+    ''', (MIXED_MATERIAL_ID,))
+    conn.execute('CREATE INDEX temp.idx_backfill_composition ON backfill_composition (empty_id)')
+
+    # Empty events with nothing logged since the previous empty are all mixed
+    conn.execute('''
+        INSERT INTO backfill_composition (empty_id, material_id, weight)
+        SELECT id, ?, weight
+        FROM trash_logs e
+        WHERE event_type = 'empty'
+          AND NOT EXISTS (SELECT 1 FROM backfill_composition c WHERE c.empty_id = e.id)
+    ''', (MIXED_MATERIAL_ID,))
+
+    # Emissions per empty event and material, scaled to the emptied weight
+    conn.execute('''
+        INSERT INTO backfill_co2
+        (empty_id, material_id, waste_type, weight, co2_landfill, co2_recycling, co2_avoided)
+        SELECT empty_id, material_id, waste_type, weight,
+               CASE WHEN waste_type = 'normal' THEN weight * landfill ELSE 0 END,
+               CASE WHEN waste_type = 'recycle' THEN weight * recycling ELSE 0 END,
+               CASE WHEN waste_type = 'recycle' THEN weight * avoided ELSE 0 END
+        FROM (
+            SELECT c.empty_id, c.material_id, e.waste_type,
+                   CASE WHEN t.weight > 0 THEN e.weight * c.weight / t.weight ELSE 0 END AS weight,
+                   COALESCE(f.landfill, m.landfill) AS landfill,
+                   COALESCE(f.recycling, m.recycling) AS recycling,
+                   COALESCE(f.avoided, m.avoided) AS avoided
+            FROM backfill_composition c
+            JOIN trash_logs e ON e.id = c.empty_id
+            JOIN (SELECT empty_id, SUM(weight) AS weight
+                  FROM backfill_composition GROUP BY empty_id) t ON t.empty_id = c.empty_id
+            LEFT JOIN backfill_factors f ON f.material_id = c.material_id
+            JOIN backfill_factors m ON m.material_id = ?
+        )
+    ''', (MIXED_MATERIAL_ID,))
+    conn.execute('CREATE INDEX temp.idx_backfill_co2 ON backfill_co2 (empty_id)')
+
+    updated = conn.execute('''
+        UPDATE trash_logs
+        SET co2_emissions = (SELECT SUM(co2_landfill + co2_recycling - co2_avoided)
+                             FROM backfill_co2 b WHERE b.empty_id = trash_logs.id),
+            factor_version = ?
+        WHERE event_type = 'empty'
+    ''', (version,)).rowcount
+
+    conn.execute('DELETE FROM material_emissions')
+    conn.execute('''
+        INSERT INTO material_emissions
+        (material_id, waste_type, weight_emptied, co2_landfill, co2_recycling,
+         co2_avoided, net_co2_emissions)
+        SELECT material_id, waste_type, SUM(weight), SUM(co2_landfill), SUM(co2_recycling),
+               SUM(co2_avoided), SUM(co2_landfill + co2_recycling - co2_avoided)
+        FROM backfill_co2
+        GROUP BY material_id, waste_type
+    ''')
+
+    conn.execute('''
+        UPDATE emissions_summary
+        SET (total_co2_landfill, total_co2_recycling, total_co2_avoided,
+             net_co2_emissions, total_waste_diverted) = (
+                SELECT COALESCE(SUM(co2_landfill), 0),
+                       COALESCE(SUM(co2_recycling), 0),
+                       COALESCE(SUM(co2_avoided), 0),
+                       COALESCE(SUM(net_co2_emissions), 0),
+                       COALESCE(SUM(CASE WHEN waste_type = 'recycle' THEN weight_emptied END), 0)
+                FROM material_emissions),
+            factor_version = ?,
+            last_updated = CURRENT_TIMESTAMP
+        WHERE id = (SELECT MAX(id) FROM emissions_summary)
+    ''', (version,))
+
+    conn.execute('DROP TABLE temp.backfill_factors')
+    conn.execute('DROP TABLE temp.backfill_composition')
+    conn.execute('DROP TABLE temp.backfill_co2')
+
+    return updated
+
+def main():
+    from database import get_db_connection, init_db
+
+    parser = argparse.ArgumentParser(description='Manage emissions factor tables')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    show_parser = subparsers.add_parser('show', help='Print a factor table')
+    show_parser.add_argument('--version', type=int)
+    add_parser = subparsers.add_parser('add-version', help='Add a factor table from a JSON file')
+    add_parser.add_argument('path')
+    backfill_parser = subparsers.add_parser('backfill', help='Recompute historical emissions')
+    backfill_parser.add_argument('--version', type=int)
+    args = parser.parse_args()
+
+    init_db()
+    conn = get_db_connection()
+    try:
+        if args.command == 'show':
+            version, factors = load_factors(conn, args.version)
+            print(f"Emissions factors version {version} (kg CO2e per kg)")
+            for material_id, values in sorted(factors.items()):
+                print(f"  {material_name(material_id):<14} " +
+                      "  ".join(f"{name}={values[name]}" for name in FACTOR_NAMES))
+        elif args.command == 'add-version':
+            factors, description = load_factor_file(args.path)
+            version = add_factor_version(conn, factors, description)
+            conn.commit()
+            print(f"✓ Added emissions factors version {version}")
+        else:
+            updated = backfill(conn, args.version)
+            conn.commit()
+            print(f"✓ Recomputed emissions for {updated} empty events")
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
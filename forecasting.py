@@ -0,0 +1,186 @@
+"""
+Fill-level forecasting and collection scheduling
+
+FillRateModel keeps, per bin and hour of the day, the total volume added
+according to trash_logs. update() only reads the add events logged since
+the previous update, so the model follows new events without refitting.
+The expected fill rate of an hour is its total volume divided by the days
+of history.
+
+The forecast functions take arrays with one row per bin and are fully
+vectorized: the next `horizon` hours of expected fill are laid out as a
+(bins, hours) matrix, and the times at which each bin reaches its capacity
+or its collection threshold are found with one cumulative sum.
+"""
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from ingest import WASTE_TYPES
+
+FORECAST_HORIZON_HOURS = int(os.getenv("FORECAST_HORIZON_HOURS", "168"))
+COLLECT_AT_PERCENT = float(os.getenv("COLLECT_AT_PERCENT", "90"))
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class FillRateModel:
+    """Per-bin, per-hour volume added, updated incrementally from trash_logs"""
+
+    def __init__(self, waste_types=WASTE_TYPES):
+        self.waste_types = tuple(waste_types)
+        self._index = {waste_type: i for i, waste_type in enumerate(self.waste_types)}
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.volume = np.zeros((len(self.waste_types), 24))
+        self.first_seen = None
+        self.last_id = 0
+
+    def update(self, conn):
+        """Add the add events logged since the last update; returns how many were read"""
+        with self._lock:
+            max_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM trash_logs').fetchone()[0]
+            if max_id < self.last_id:
+                # The log was cleared or rebuilt, so start over
+                self._reset()
+
+            rows = conn.execute('''
+                SELECT waste_type, CAST(strftime('%H', timestamp) AS INTEGER), SUM(volume),
+                       MIN(timestamp), COUNT(*)
+                FROM trash_logs
+                WHERE event_type = 'add' AND id > ? AND id <= ?
+                GROUP BY 1, 2
+            ''', (self.last_id, max_id)).fetchall()
+
+            count = 0
+            for waste_type, hour, volume, first, events in rows:
+                if waste_type not in self._index or hour is None:
+                    continue
+                self.volume[self._index[waste_type], hour] += volume
+                first = datetime.strptime(first[:19], TIMESTAMP_FORMAT)
+                if self.first_seen is None or first < self.first_seen:
+                    self.first_seen = first
+                count += events
+
+            self.last_id = max_id
+            return count
+
+    def rates(self, now):
+        """Expected litres added per hour of the day, shape (bins, 24)"""
+        with self._lock:
+            if self.first_seen is None:
+                return np.zeros_like(self.volume), 0.0
+            days = max((now - self.first_seen).total_seconds() / 86400, 1.0)
+            return self.volume / days, days
+
+
+def hourly_fill(rates, now, horizon):
+    """Expected volume added in each of the next `horizon` hours, shape (bins, horizon)
+
+    The first column only covers the rest of the current hour.
+    """
+    fill = rates[:, (now.hour + np.arange(horizon)) % 24]
+    fill[:, 0] *= 1 - (now.minute * 60 + now.second) / 3600
+    return fill
+
+def hours_until(fill, targets, now):
+    """Hours from now until each bin has added each target volume
+
+    fill is (bins, hours) from hourly_fill and targets is (bins, k). Targets
+    that are not reached within the horizon are NaN.
+    """
+    elapsed = (now.minute * 60 + now.second) / 3600
+    cumulative = np.cumsum(fill, axis=1)
+    reached = cumulative[:, None, :] >= targets[:, :, None]
+    step = reached.argmax(axis=2)
+
+    # Interpolate inside the hour in which the target is reached
+    step_fill = np.take_along_axis(fill, step, axis=1)
+    before = np.take_along_axis(cumulative, step, axis=1) - step_fill
+    share = np.divide(targets - before, step_fill, out=np.zeros_like(targets), where=step_fill > 0)
+    start = np.where(step == 0, 0.0, step - elapsed)
+    length = np.where(step == 0, 1 - elapsed, 1.0)
+    hours = np.clip(start + share * length, 0, None)
+
+    return np.where(reached.any(axis=2), hours, np.nan)
+
+def forecast_bins(rates, volume, capacity, now, horizon=FORECAST_HORIZON_HOURS,
+                  collect_at_percent=COLLECT_AT_PERCENT):
+    """Forecast time to full and collection times for many bins at once
+
+    rates is (bins, 24) litres per hour, volume and capacity are (bins,).
+    Each bin is collected when it reaches collect_at_percent of its capacity
+    and is empty afterwards. Returns (hours to full, collection hours), where
+    collection hours is (bins, k) padded with NaN.
+    """
+    volume = np.asarray(volume, dtype=float)
+    capacity = np.asarray(capacity, dtype=float)
+    fill = hourly_fill(rates, now, horizon)
+
+    hours_to_full = hours_until(fill, (capacity - volume)[:, None], now)[:, 0]
+
+    # Collections happen each time another threshold's worth has been added
+    threshold = capacity * collect_at_percent / 100
+    first = np.clip(threshold - volume, 0, None)
+    total = fill.sum(axis=1)
+    collections = np.divide(total - first, threshold, out=np.zeros_like(total), where=threshold > 0)
+    k = int(min(max(np.floor(collections.max(initial=0)), 0) + 1, horizon))
+    targets = first[:, None] + threshold[:, None] * np.arange(k)
+
+    return hours_to_full, hours_until(fill, targets, now)
+
+
+def utc_now():
+    """Current time in the same (naive UTC) form as SQLite's CURRENT_TIMESTAMP"""
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+def format_time(now, hours):
+    if np.isnan(hours):
+        return None
+    return (now + timedelta(hours=float(hours))).strftime(TIMESTAMP_FORMAT)
+
+def build_forecast(model, status, now=None, horizon=FORECAST_HORIZON_HOURS,
+                   collect_at_percent=COLLECT_AT_PERCENT):
+    """Forecast the bins in a trashbin_status row as a JSON-ready dict"""
+    now = now or utc_now()
+    rates, days = model.rates(now)
+    volume = [status[f'{waste_type}_volume'] if status else 0 for waste_type in model.waste_types]
+    capacity = [status[f'{waste_type}_capacity'] if status else 0 for waste_type in model.waste_types]
+    hours_to_full, collections = forecast_bins(rates, volume, capacity, now, horizon, collect_at_percent)
+
+    bins = []
+    schedule = []
+    for i, waste_type in enumerate(model.waste_types):
+        full = None if np.isnan(hours_to_full[i]) else round(float(hours_to_full[i]), 2)
+        bins.append({
+            'waste_type': waste_type,
+            'volume': volume[i],
+            'capacity': capacity[i],
+            'fill_percent': round(volume[i] / capacity[i] * 100, 1) if capacity[i] else None,
+            'fill_rate_per_day': round(float(rates[i].sum()), 3),
+            'hours_to_full': full,
+            'full_at': format_time(now, hours_to_full[i])
+        })
+        for hours in collections[i][~np.isnan(collections[i])]:
+            schedule.append({
+                'waste_type': waste_type,
+                'collect_at': format_time(now, hours),
+                'hours_from_now': round(float(hours), 2)
+            })
+
+    schedule.sort(key=lambda collection: collection['hours_from_now'])
+    return {
+        'generated_at': now.strftime(TIMESTAMP_FORMAT),
+        'horizon_hours': horizon,
+        'collect_at_percent': collect_at_percent,
+        'history_days': round(days, 1),
+        'bins': bins,
+        'schedule': schedule
+    }
+
+
+model = FillRateModel()
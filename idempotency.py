@@ -0,0 +1,86 @@
+"""
+Idempotent ingestion with client-supplied event IDs
+
+Ingest endpoints accept an optional event_id. The first successful request
+stores its response in the ingest_events table (unique on event_id) in the
+same transaction as the trash logs and status update. Retries with the same
+event_id get that original response back without touching the bin status.
+An event_id belongs to the endpoint that first applied it; reusing it on
+another endpoint is a 409 conflict rather than a replay. A bounded in-memory cache of recent event IDs answers most retries without
+a database lookup.
+"""
+import json
+import os
+import sqlite3
+from lru import LRUCache
+
+RECENT_EVENTS_SIZE = int(os.getenv("RECENT_EVENTS_SIZE", "10000"))
+MAX_EVENT_ID_LENGTH = 128
+
+# Recent event_id -> (endpoint, payload, status_code)
+recent_events = LRUCache(maxsize=RECENT_EVENTS_SIZE)
+
+def validate_event_id(event_id):
+    """Check an event_id from a request, returning an error message or None"""
+    if event_id is None:
+        return None
+    if not isinstance(event_id, str) or not event_id or len(event_id) > MAX_EVENT_ID_LENGTH:
+        return f'event_id must be a non-empty string of at most {MAX_EVENT_ID_LENGTH} characters'
+    return None
+
+def lookup(conn, event_id, endpoint):
+    """Get the stored (payload, status_code) of an event, or None if it is new
+
+    An event_id that was applied by another endpoint gets a 409 error.
+    """
+    if event_id is None:
+        return None
+
+    entry = recent_events.get(event_id)
+    if entry is None:
+        row = conn.execute(
+            'SELECT endpoint, response, status_code FROM ingest_events WHERE event_id = ?', (event_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        entry = (row[0], json.loads(row[1]), row[2])
+        recent_events.put(event_id, entry)
+
+    applied_by, payload, status_code = entry
+    if applied_by != endpoint:
+        return {'error': f'event_id {event_id} was already used for {applied_by}'}, 409
+    return payload, status_code
+
+def run_once(conn, event_id, endpoint, ingest, *args):
+    """Run ingest(conn, *args) and commit it unless event_id was already applied
+
+    ingest does its writes without committing and returns (payload,
+    status_code). Successful results are stored under event_id in the same
+    transaction. Error results are rolled back, so a corrected retry with
+    the same event_id still goes through.
+    """
+    previous = lookup(conn, event_id, endpoint)
+    if previous is not None:
+        return previous
+
+    payload, status_code = ingest(conn, *args)
+    if status_code >= 400:
+        conn.rollback()
+        return payload, status_code
+
+    if event_id is not None:
+        try:
+            conn.execute('''
+                INSERT INTO ingest_events (event_id, endpoint, response, status_code)
+                VALUES (?, ?, ?, ?)
+            ''', (event_id, endpoint, json.dumps(payload), status_code))
+        except sqlite3.IntegrityError:
+            # A concurrent request with the same event_id committed first
+            conn.rollback()
+            return lookup(conn, event_id, endpoint)
+
+    conn.commit()
+
+    if event_id is not None:
+        recent_events.put(event_id, (endpoint, payload, status_code))
+    return payload, status_code
@@ -0,0 +1,66 @@
+"""
+Shared ingest path for every write of added trash
+
+All endpoints, the detection pipeline and the seed script turn their input
+into items with make_item() and write them with ingest_items(): one
+executemany for the log rows and one aggregated status update per bin,
+inside the caller's transaction. Product and brand names are logged as
+given, together with the IDs of their canonical entries (see catalog.py).
+"""
+import catalog
+
+WASTE_TYPES = ('normal', 'recycle')
+
+def make_item(waste_type, volume, weight, brand=None, product=None, material_id=None,
+              confidence=None, source='manual', timestamp=None):
+    """Build an item to ingest (volume in litres, weight in kg)"""
+    return {
+        'waste_type': waste_type,
+        'volume': volume,
+        'weight': weight,
+        'brand': brand,
+        'product': product,
+        'material_id': material_id,
+        'confidence': confidence,
+        'source': source,
+        'timestamp': timestamp
+    }
+
+def ingest_items(conn, items):
+    """Log add events for items and add them to the bin status without committing
+
+    Returns the total volume and weight added per waste type.
+    """
+    totals = {waste_type: {'volume': 0.0, 'weight': 0.0} for waste_type in WASTE_TYPES}
+    if not items:
+        return totals
+
+    conn.executemany('''
+        INSERT INTO trash_logs (waste_type, volume, weight, brand, product, product_id, brand_id, event_type,
+                                co2_emissions, material_id, confidence, source, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'add', 0, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+    ''', [(item['waste_type'], item['volume'], item['weight'], item['brand'], item['product'],
+           product_id, brand_id,
+           item['material_id'], item['confidence'], item['source'], item['timestamp'])
+          for item, (product_id, brand_id) in zip(items, catalog.resolve_items(conn, items))])
+
+    for item in items:
+        totals[item['waste_type']]['volume'] += item['volume']
+        totals[item['waste_type']]['weight'] += item['weight']
+
+    # Items with explicit timestamps (e.g. seeded history) set last_updated to the newest one
+    timestamps = [item['timestamp'] for item in items if item['timestamp'] is not None]
+
+    conn.execute('''
+        UPDATE trashbin_status
+        SET normal_volume = normal_volume + ?,
+            normal_weight = normal_weight + ?,
+            recycle_volume = recycle_volume + ?,
+            recycle_weight = recycle_weight + ?,
+            last_updated = COALESCE(?, CURRENT_TIMESTAMP)
+        WHERE id = (SELECT MAX(id) FROM trashbin_status)
+    ''', (totals['normal']['volume'], totals['normal']['weight'],
+          totals['recycle']['volume'], totals['recycle']['weight'],
+          max(timestamps) if timestamps else None))
+
+    return totals
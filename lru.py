@@ -0,0 +1,32 @@
+"""
+Small thread-safe LRU cache shared by the in-memory caches
+"""
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe, bounded LRU mapping; get() returns None for missing keys"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
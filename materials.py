@@ -0,0 +1,50 @@
+"""
+Material categories used by the classifier, emissions factors and logs
+"""
+
+# Used when the material of the waste is unknown (e.g. manually added items)
+MIXED_MATERIAL_ID = 0
+
+id_to_material = {
+    1 : "Glass",
+    2 : "Paper",
+    3 : "Plastic",
+    4 : "Metal",
+    5 : "Cardboard",
+    6 : "Biodegradable"
+}
+
+def material_name(material_id):
+    """Get the display name of a material ID"""
+    return id_to_material.get(material_id, "Mixed")
+
+def material_id_from_name(name):
+    """Look up a material ID by (case-insensitive) name, or None if unknown"""
+    name = name.strip().lower()
+    if name == "mixed":
+        return MIXED_MATERIAL_ID
+    for material_id, material in id_to_material.items():
+        if material.lower() == name:
+            return material_id
+    return None
+
+def resolve_material(value):
+    """Convert a material ID or name from a request into a material ID
+
+    Returns None when no material was given and raises ValueError for
+    unknown materials.
+    """
+    if value is None or value == '':
+        return None
+    # bool is an int subclass, so True would otherwise mean Glass
+    if isinstance(value, bool):
+        raise ValueError(f'Unknown material: {value}')
+    if isinstance(value, int) or str(value).isdigit():
+        material_id = int(value)
+        if material_id != MIXED_MATERIAL_ID and material_id not in id_to_material:
+            raise ValueError(f'Unknown material: {value}')
+        return material_id
+    material_id = material_id_from_name(str(value))
+    if material_id is None:
+        raise ValueError(f'Unknown material: {value}')
+    return material_id
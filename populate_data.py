@@ -4,11 +4,17 @@ Populate database with 7 days of dummy data for chart visualization
 import sqlite3
 from datetime import datetime, timedelta
 import random
+from database import DATABASE, init_db
+from emissions import record_empty
+from ingest import ingest_items, make_item
 
-DATABASE = 'trashbin.db'
+# Materials (see materials.id_to_material) typically found in each bin
+NORMAL_MATERIALS = [2, 3, 6]
+RECYCLE_MATERIALS = [1, 2, 3, 4, 5]
 
 def populate_dummy_data():
     """Add 7 days of sample data to the database"""
+    init_db()
     conn = sqlite3.connect(DATABASE)
     cursor = conn.cursor()
     
@@ -19,6 +25,8 @@ def populate_dummy_data():
         # Calculate the date
         target_date = datetime.now() - timedelta(days=day_offset)
         
+        items = []
+        
         # Generate 2-4 normal waste entries per day
         num_normal_entries = random.randint(2, 4)
         for i in range(num_normal_entries):
@@ -30,21 +38,9 @@ def populate_dummy_data():
             minute = random.randint(0, 59)
             timestamp = target_date.replace(hour=hour, minute=minute, second=0)
             
-            cursor.execute('''
-                INSERT INTO trash_logs (waste_type, volume, weight, event_type, co2_emissions, timestamp)
-                VALUES (?, ?, ?, 'add', 0, ?)
-            ''', ('normal', volume, weight, timestamp.strftime('%Y-%m-%d %H:%M:%S')))
-            
-            # Update running status
-            cursor.execute('''
-                UPDATE trashbin_status
-                SET normal_volume = normal_volume + ?,
-                    normal_weight = normal_weight + ?,
-                    last_updated = ?
-                WHERE id = (SELECT MAX(id) FROM trashbin_status)
-            ''', (volume, weight, timestamp.strftime('%Y-%m-%d %H:%M:%S')))
-        
-        print(f"  ✓ Day {day_offset}: Added {num_normal_entries} normal waste entries")
+            items.append(make_item('normal', volume, weight,
+                                   material_id=random.choice(NORMAL_MATERIALS), source='seed',
+                                   timestamp=timestamp.strftime('%Y-%m-%d %H:%M:%S')))
         
         # Generate 1-3 recyclable waste entries per day
         num_recycle_entries = random.randint(1, 3)
@@ -57,20 +53,14 @@ def populate_dummy_data():
             minute = random.randint(0, 59)
             timestamp = target_date.replace(hour=hour, minute=minute, second=0)
             
-            cursor.execute('''
-                INSERT INTO trash_logs (waste_type, volume, weight, event_type, co2_emissions, timestamp)
-                VALUES (?, ?, ?, 'add', 0, ?)
-            ''', ('recycle', volume, weight, timestamp.strftime('%Y-%m-%d %H:%M:%S')))
-            
-            # Update running status
-            cursor.execute('''
-                UPDATE trashbin_status
-                SET recycle_volume = recycle_volume + ?,
-                    recycle_weight = recycle_weight + ?,
-                    last_updated = ?
-                WHERE id = (SELECT MAX(id) FROM trashbin_status)
-            ''', (volume, weight, timestamp.strftime('%Y-%m-%d %H:%M:%S')))
+            items.append(make_item('recycle', volume, weight,
+                                   material_id=random.choice(RECYCLE_MATERIALS), source='seed',
+                                   timestamp=timestamp.strftime('%Y-%m-%d %H:%M:%S')))
+        
+        # Log the day's entries and update the running status
+        ingest_items(cursor, items)
         
+        print(f"  ✓ Day {day_offset}: Added {num_normal_entries} normal waste entries")
         print(f"  ✓ Day {day_offset}: Added {num_recycle_entries} recyclable waste entries")
         
         # Randomly empty bins every 2-3 days
@@ -79,27 +69,8 @@ def populate_dummy_data():
             status = cursor.execute('SELECT normal_volume, normal_weight, recycle_volume, recycle_weight FROM trashbin_status ORDER BY id DESC LIMIT 1').fetchone()
             
             if status:
-                normal_weight = status[1]
-                recycle_weight = status[3]
-                
-                # Calculate emissions
-                normal_co2 = normal_weight * 0.5  # Landfill emissions
-                recycle_co2 = (recycle_weight * 0.1) - (recycle_weight * 2.0)  # Net negative
-                recycle_avoided = recycle_weight * 2.0
-                
                 timestamp = target_date.replace(hour=22, minute=0, second=0)
                 
-                # Log empty events
-                cursor.execute('''
-                    INSERT INTO trash_logs (waste_type, volume, weight, event_type, co2_emissions, timestamp)
-                    VALUES ('normal', ?, ?, 'empty', ?, ?)
-                ''', (status[0], normal_weight, normal_co2, timestamp.strftime('%Y-%m-%d %H:%M:%S')))
-                
-                cursor.execute('''
-                    INSERT INTO trash_logs (waste_type, volume, weight, event_type, co2_emissions, timestamp)
-                    VALUES ('recycle', ?, ?, 'empty', ?, ?)
-                ''', (status[2], recycle_weight, recycle_co2, timestamp.strftime('%Y-%m-%d %H:%M:%S')))
-                
                 # Reset bins
                 cursor.execute('''
                     UPDATE trashbin_status
@@ -111,18 +82,11 @@ def populate_dummy_data():
                     WHERE id = (SELECT MAX(id) FROM trashbin_status)
                 ''', (timestamp.strftime('%Y-%m-%d %H:%M:%S'),))
                 
-                # Update emissions summary
-                cursor.execute('''
-                    UPDATE emissions_summary
-                    SET total_co2_landfill = total_co2_landfill + ?,
-                        total_co2_recycling = total_co2_recycling + ?,
-                        total_co2_avoided = total_co2_avoided + ?,
-                        net_co2_emissions = net_co2_emissions + ?,
-                        total_waste_diverted = total_waste_diverted + ?,
-                        last_updated = ?
-                    WHERE id = (SELECT MAX(id) FROM emissions_summary)
-                ''', (normal_co2, abs(recycle_co2) if recycle_co2 > 0 else 0, recycle_avoided, 
-                      normal_co2 + recycle_co2, recycle_weight, timestamp.strftime('%Y-%m-%d %H:%M:%S')))
+                # Log empty events and update the emissions summary
+                record_empty(cursor, 'normal', status[0], status[1],
+                             timestamp=timestamp.strftime('%Y-%m-%d %H:%M:%S'))
+                record_empty(cursor, 'recycle', status[2], status[3],
+                             timestamp=timestamp.strftime('%Y-%m-%d %H:%M:%S'))
                 
                 print(f"  🧹 Day {day_offset}: Emptied both bins (CO₂ calculated)")
     
@@ -0,0 +1,93 @@
+"""
+Compare token usage and latency of the classifier prompt modes
+
+Classifies every image in a folder once per prompt mode and prints the mean
+input, cached and output tokens and the latency per call, plus how often the
+modes agree on the categories found. This makes real API calls.
+
+Usage:
+    python prompt_benchmark.py <image folder> [--modes full compact] [--repeat 2]
+
+Example:
+    python prompt_benchmark.py . --repeat 3
+    IMAGE_DETAIL=low python prompt_benchmark.py recordings/frames
+"""
+
+import argparse
+import mimetypes
+import os
+import sys
+
+import camera
+import classifier
+from stats import percentile
+
+
+def load_images(directory):
+    """Read the images in a folder as data URIs, in replay order"""
+    images = []
+    for path in camera.FolderCapture(directory).paths:
+        with open(path, 'rb') as f:
+            images.append((os.path.basename(path), camera.upload_to_data_uri(f.read(), mimetypes.guess_type(path)[0])))
+    return images
+
+def run_benchmark(images, modes, repeat=1):
+    """Classify each image repeat times per mode
+
+    Returns {mode: [(image name, resp_dict), ...]}.
+    """
+    results = {mode: [] for mode in modes}
+    for _ in range(repeat):
+        for name, b64_str in images:
+            for mode in modes:
+                try:
+                    results[mode].append((name, classifier.create_response(b64_str, mode)))
+                except Exception as e:
+                    print(f"✗ {mode} failed on {name}: {e}")
+    return results
+
+def print_report(results):
+    print(f"{'Mode':<10}{'calls':>7}{'input':>9}{'cached':>9}{'output':>9}{'items':>7}{'mean ms':>10}{'p95 ms':>10}")
+    for mode, calls in results.items():
+        if not calls:
+            continue
+        usages = [resp_dict['usage'] for _, resp_dict in calls]
+        latencies = [usage['latency_ms'] for usage in usages]
+
+        def mean(key):
+            values = [usage[key] or 0 for usage in usages]
+            return sum(values) / len(values)
+
+        items = sum(len(resp_dict['out']) for _, resp_dict in calls) / len(calls)
+        print(f"{mode:<10}{len(calls):>7}{mean('input_tokens'):>9.0f}{mean('cached_tokens'):>9.0f}"
+              f"{mean('output_tokens'):>9.0f}{items:>7.1f}{mean('latency_ms'):>10.0f}{percentile(latencies, 95):>10.0f}")
+
+    # Agreement on the set of categories per image, relative to the first mode
+    modes = [mode for mode, calls in results.items() if calls]
+    if len(modes) > 1:
+        def categories(calls):
+            return {name: sorted(out['id'] for out in resp_dict['out']) for name, resp_dict in calls}
+
+        baseline = categories(results[modes[0]])
+        for mode in modes[1:]:
+            other = categories(results[mode])
+            shared = [name for name in baseline if name in other]
+            agree = sum(baseline[name] == other[name] for name in shared)
+            print(f"\n{mode} agrees with {modes[0]} on categories for {agree}/{len(shared)} images")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare token usage and latency of the prompt modes")
+    parser.add_argument('directory', help="Folder of images to classify")
+    parser.add_argument('--modes', nargs='+', default=list(classifier.PROMPT_MODES), choices=classifier.PROMPT_MODES)
+    parser.add_argument('--repeat', type=int, default=1, help="Times to classify each image per mode")
+    args = parser.parse_args()
+
+    images = load_images(args.directory)
+    if not images:
+        print(f"✗ Error: no images found in '{args.directory}'")
+        sys.exit(1)
+
+    print(f"Classifying {len(images)} image(s) x {args.repeat} with {classifier.MODEL} "
+          f"(image detail: {classifier.IMAGE_DETAIL})")
+    print("-" * 50)
+    print_report(run_benchmark(images, args.modes, args.repeat))
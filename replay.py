@@ -0,0 +1,256 @@
+"""
+Replay a recording through the full detection pipeline
+
+Frames from a video file or a folder of images (such as the bundled
+0.jpg/1.jpg) go through the same stages as a live camera:
+
+    capture -> change detect -> encode -> classify -> ingest
+
+Capture and change detection run on one thread, like a camera's capture
+thread. Changed frames are queued for a pool of workers that encode, classify
+and log them with the same services as /api/detect. The classifier is stubbed
+with a fixed answer and a configurable latency, so runs are repeatable and
+free. The report shows throughput, per-stage latency and how busy each stage
+was, which tells where the pipeline saturates.
+
+In real-time mode frames arrive at the recording's frame rate, and frames that
+find the queue full are dropped, as they would be with a live camera. With
+--max-speed the capture thread waits for the workers instead.
+
+Usage:
+    python replay.py <video file or image folder> [options]
+
+Example:
+    python replay.py . --max-speed --frames 200 --workers 4
+    python replay.py recordings/bin.mp4 --classify-latency 1.5
+"""
+
+import argparse
+import copy
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+
+import camera
+import database
+import services
+from materials import material_name
+from stats import percentile
+
+# Answer of the stubbed classifier: one plastic bottle per changed frame
+STUB_OUTPUT = {
+    'out': [{
+        'id': 3,
+        'item_description': 'Replayed water bottle',
+        'brand_name': 'Replay',
+        'weight': 20,
+        'volume': 500,
+        'recyclable': True,
+        'confidence': 0.9,
+        'material': material_name(3)
+    }]
+}
+
+CAPTURE_STAGES = ('read', 'change-detect')
+WORKER_STAGES = ('encode', 'classify', 'ingest')
+
+
+def stub_classifier(latency):
+    """Build a classifier that waits latency seconds and returns STUB_OUTPUT"""
+    def classify(b64_str):
+        time.sleep(latency)
+        return copy.deepcopy(STUB_OUTPUT)
+    return classify
+
+
+class ReplayStats:
+    """Thread-safe timings (seconds) per stage and event counters"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.counts = {'frames': 0, 'changed': 0, 'dropped': 0, 'detections': 0, 'errors': 0}
+
+    def add(self, **timings):
+        with self.lock:
+            for stage, seconds in timings.items():
+                self.timings.setdefault(stage, []).append(seconds)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counts[name] += n
+
+
+def run_replay(source, realtime=True, fps=None, frames=None, workers=4, queue_size=8,
+               classify=None, all_frames=False):
+    """Replay source through the pipeline and return (stats, wall time in seconds)
+
+    frames limits the number of frames read; the source is looped until it
+    is reached. Without it, the source is read once.
+    """
+    classify = classify or stub_classifier(0.5)
+    cam = camera.Camera('replay', source, fps=fps, realtime=realtime)
+    stats = ReplayStats()
+    jobs = queue.Queue(maxsize=queue_size)
+    run_id = uuid.uuid4().hex[:8]
+
+    def worker():
+        conn = database.get_db_connection()
+        try:
+            while True:
+                job = jobs.get()
+                if job is None:
+                    break
+                index, frame, captured = job
+
+                started = time.monotonic()
+                b64_str = camera.encode_frame(frame)
+                encoded = time.monotonic()
+                try:
+                    resp_dict = classify(b64_str)
+                    classified = time.monotonic()
+                    result, status_code = services.record_detections(conn, resp_dict, f'replay-{run_id}-{index}')
+                except Exception as e:
+                    print(f"✗ Frame {index}: {e}")
+                    stats.count('errors')
+                    continue
+                done = time.monotonic()
+
+                if status_code >= 400:
+                    stats.count('errors')
+                    continue
+                stats.count('detections', len(result['out']))
+                stats.add(**{
+                    'queue wait': started - captured,
+                    'encode': encoded - started,
+                    'classify': classified - encoded,
+                    'ingest': done - classified,
+                    'end-to-end': done - captured
+                })
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=worker, name=f'replay-{i}', daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    cap = camera.open_source(source)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open replay source: {source}")
+    interval = cam.frame_interval(cap)
+
+    start = time.monotonic()
+    index = 0
+    while frames is None or index < frames:
+        read_started = time.monotonic()
+        ret, frame = cap.read()
+        if not ret:
+            if frames is None or index == 0:
+                break
+            cap.release()
+            cap = camera.open_source(source)
+            continue
+        read_done = time.monotonic()
+        changed = cam.put_frame(frame)
+        captured = time.monotonic()
+
+        stats.count('frames')
+        stats.add(**{'read': read_done - read_started, 'change-detect': captured - read_done})
+
+        if changed or all_frames:
+            stats.count('changed')
+            if interval:
+                try:
+                    jobs.put_nowait((index, frame, read_started))
+                except queue.Full:
+                    stats.count('dropped')
+            else:
+                jobs.put((index, frame, read_started))
+        index += 1
+
+        if interval:
+            time.sleep(max(0, interval - (time.monotonic() - read_started)))
+
+    cap.release()
+    for _ in threads:
+        jobs.put(None)
+    for thread in threads:
+        thread.join()
+
+    return stats, time.monotonic() - start
+
+def print_report(stats, wall, workers):
+    """Print throughput, per-stage latency and utilization"""
+    counts = stats.counts
+    print(f"Frames read:       {counts['frames']} ({counts['frames'] / wall:.1f} fps)")
+    print(f"Changed frames:    {counts['changed']}")
+    print(f"Dropped frames:    {counts['dropped']}")
+    print(f"Errors:            {counts['errors']}")
+    print(f"Items logged:      {counts['detections']} ({counts['detections'] / wall:.1f} /s)")
+    print(f"Wall time:         {wall:.2f}s")
+    print()
+    print(f"{'Stage':<15}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'busy':>8}")
+
+    busy = {}
+    for stage in CAPTURE_STAGES + WORKER_STAGES + ('queue wait', 'end-to-end'):
+        values = stats.timings.get(stage, [])
+        mean = sum(values) / len(values) if values else 0.0
+        utilization = ''
+        if stage in CAPTURE_STAGES:
+            busy[stage] = sum(values) / wall
+        elif stage in WORKER_STAGES:
+            busy[stage] = sum(values) / (wall * workers)
+        if stage in busy:
+            utilization = f"{busy[stage]:.0%}"
+        print(f"{stage:<15}{mean * 1000:>10.2f}{percentile(values, 50) * 1000:>10.2f}"
+              f"{percentile(values, 95) * 1000:>10.2f}{max(values, default=0) * 1000:>10.2f}{utilization:>8}")
+
+    # The capture thread and the worker pool saturate separately
+    capture_busy = sum(busy.get(stage, 0) for stage in CAPTURE_STAGES)
+    worker_busy = sum(busy.get(stage, 0) for stage in WORKER_STAGES)
+    print()
+    if worker_busy >= capture_busy:
+        bottleneck = max(WORKER_STAGES, key=lambda stage: busy.get(stage, 0))
+        print(f"Workers busy {worker_busy:.0%} of the time, mostly in {bottleneck}")
+    else:
+        bottleneck = max(CAPTURE_STAGES, key=lambda stage: busy.get(stage, 0))
+        print(f"Capture thread busy {capture_busy:.0%} of the time, mostly in {bottleneck}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recording through the detection pipeline")
+    parser.add_argument('source', help="Video file or folder of images")
+    parser.add_argument('--max-speed', action='store_true', help="Read frames as fast as the pipeline takes them")
+    parser.add_argument('--fps', type=float, help="Replay frame rate (default: the recording's, 1 for folders)")
+    parser.add_argument('--frames', type=int, help="Frames to read, looping the source if needed")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent encode/classify/ingest workers")
+    parser.add_argument('--queue-size', type=int, default=8, help="Changed frames waiting for a worker")
+    parser.add_argument('--classify-latency', type=float, default=0.5, help="Seconds the stubbed classifier takes")
+    parser.add_argument('--all-frames', action='store_true', help="Classify every frame, not only changed ones")
+    parser.add_argument('--db', default='replay.db', help="Database file the detections are logged to")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        print(f"✗ Error: '{args.source}' not found")
+        sys.exit(1)
+
+    database.DATABASE = args.db
+    database.init_db()
+
+    mode = 'max speed' if args.max_speed else 'real time'
+    print(f"Replaying {args.source} at {mode} with {args.workers} workers into {args.db}")
+    print("-" * 50)
+
+    stats, wall = run_replay(
+        args.source,
+        realtime=not args.max_speed,
+        fps=args.fps,
+        frames=args.frames,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        classify=stub_classifier(args.classify_latency),
+        all_frames=args.all_frames
+    )
+    print_report(stats, wall, args.workers)
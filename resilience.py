@@ -0,0 +1,236 @@
+"""
+Deadlines, retries, concurrency limits and a circuit breaker for upstream calls
+
+Resilient wraps a call (sync or async) so that:
+- the whole call, retries included, finishes within a deadline, and each
+  attempt gets the time that is left as its timeout;
+- retryable errors are retried a bounded number of times with exponential
+  back-off and full jitter;
+- at most `concurrency` calls are in flight, and callers that cannot get a
+  slot before their deadline are turned away;
+- when the recent error rate spikes, a circuit breaker opens and calls fail
+  fast (or return the cached result for the same key) until a cooldown has
+  passed and a trial call succeeds.
+
+Calls that cannot be served raise Unavailable, which the API maps to 503.
+"""
+import asyncio
+import copy
+import random
+import threading
+import time
+from collections import deque
+from lru import LRUCache
+
+
+class Unavailable(Exception):
+    """The upstream service cannot serve the call right now"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Thread-safe breaker that opens when the error rate over recent calls is too high"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window=20, min_calls=5, error_rate=0.5, cooldown=30.0):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go upstream now, as (allowed, trial)
+
+        Half-open lets one trial call through; only that call may close or
+        re-open the breaker.
+        """
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED:
+                return True, False
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True, True
+            return False, False
+
+    def record(self, success, trial=False):
+        """Count the upstream outcome of a call that allow() let through"""
+        with self._lock:
+            if trial:
+                self._trial_running = False
+                if success:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            if self.state != self.CLOSED:
+                # Started before the breaker opened; the trial call decides now
+                return
+
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.error_rate:
+                self._open()
+
+    def release(self, trial=False):
+        """End a call that neither succeeded nor failed upstream, freeing the trial if it held it"""
+        if not trial:
+            return
+        with self._lock:
+            self._trial_running = False
+
+    def retry_after(self):
+        """Seconds until the breaker lets a trial call through"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0
+            return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+
+class Resilient:
+    """Run calls to one upstream service with a deadline, retries, a concurrency limit and a breaker
+
+    The wrapped function must accept a `timeout` keyword (seconds) and raise
+    one of `retryable` for failures worth retrying; other exceptions are
+    passed through without retries and do not count against the breaker.
+    """
+
+    def __init__(self, name, retryable, deadline=45.0, attempt_timeout=20.0, retries=2,
+                 backoff=0.5, max_backoff=8.0, concurrency=8, breaker=None, cache_size=256):
+        self.name = name
+        self.retryable = tuple(retryable)
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.concurrency = concurrency
+        self.breaker = breaker or CircuitBreaker()
+        self.results = LRUCache(maxsize=cache_size)
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._async_slots = {}
+
+    def _delay(self, attempt):
+        # Full jitter keeps retries from many workers from lining up
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _fallback(self, key, message):
+        """Return a copy of the cached result for key, or raise Unavailable"""
+        cached = self.results.get(key) if key is not None else None
+        if cached is None:
+            raise Unavailable(f"{self.name} unavailable: {message}", self.breaker.retry_after())
+        result = copy.deepcopy(cached)
+        if isinstance(result, dict):
+            result['fallback'] = 'cache'
+        return result
+
+    def _store(self, key, result):
+        if key is not None:
+            self.results.put(key, copy.deepcopy(result))
+        return result
+
+    def call(self, key, func, *args, **kwargs):
+        """Call func(*args, timeout=..., **kwargs) from a thread
+
+        key identifies the input (e.g. a hash of the image) for the cached fallback.
+        """
+        expires = time.monotonic() + self.deadline
+        allowed, trial = self.breaker.allow()
+        if not allowed:
+            return self._fallback(key, "circuit open")
+
+        if not self._slots.acquire(timeout=max(0.0, expires - time.monotonic())):
+            self.breaker.release(trial)
+            return self._fallback(key, "too many calls in flight")
+        try:
+            last_error = None
+            for attempt in range(self.retries + 1):
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    result = func(*args, timeout=min(self.attempt_timeout, remaining), **kwargs)
+                except self.retryable as e:
+                    last_error = e
+                    delay = self._delay(attempt)
+                    if attempt == self.retries or time.monotonic() + delay >= expires:
+                        break
+                    time.sleep(delay)
+                    continue
+                except Exception:
+                    self.breaker.release(trial)
+                    raise
+                self.breaker.record(True, trial)
+                return self._store(key, result)
+        finally:
+            self._slots.release()
+
+        if last_error is None:
+            # The deadline ran out waiting for a slot, so upstream never saw the call
+            self.breaker.release(trial)
+            return self._fallback(key, "deadline exceeded before the call was made")
+        self.breaker.record(False, trial)
+        return self._fallback(key, type(last_error).__name__)
+
+    async def call_async(self, key, func, *args, **kwargs):
+        """Await func(*args, timeout=..., **kwargs) on the running event loop"""
+        expires = time.monotonic() + self.deadline
+        allowed, trial = self.breaker.allow()
+        if not allowed:
+            return self._fallback(key, "circuit open")
+
+        # asyncio semaphores belong to one event loop
+        loop = asyncio.get_running_loop()
+        slots = self._async_slots.setdefault(loop, asyncio.Semaphore(self.concurrency))
+        try:
+            await asyncio.wait_for(slots.acquire(), self.deadline)
+        except asyncio.TimeoutError:
+            self.breaker.release(trial)
+            return self._fallback(key, "too many calls in flight")
+        try:
+            last_error = None
+            for attempt in range(self.retries + 1):
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    break
+                timeout = min(self.attempt_timeout, remaining)
+                try:
+                    result = await asyncio.wait_for(func(*args, timeout=timeout, **kwargs), timeout)
+                except self.retryable + (asyncio.TimeoutError,) as e:
+                    last_error = e
+                    delay = self._delay(attempt)
+                    if attempt == self.retries or time.monotonic() + delay >= expires:
+                        break
+                    await asyncio.sleep(delay)
+                    continue
+                except Exception:
+                    self.breaker.release(trial)
+                    raise
+                self.breaker.record(True, trial)
+                return self._store(key, result)
+        finally:
+            slots.release()
+
+        if last_error is None:
+            # The deadline ran out waiting for a slot, so upstream never saw the call
+            self.breaker.release(trial)
+            return self._fallback(key, "deadline exceeded before the call was made")
+        self.breaker.record(False, trial)
+        return self._fallback(key, type(last_error).__name__)
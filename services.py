@@ -0,0 +1,479 @@
+"""
+Request handling logic shared by the Flask (app.py) and ASGI (asgi_app.py) servers
+
+Each function takes an open database connection and the parsed request data,
+and returns the response payload and HTTP status code. The web layers only
+deal with connections, threads and serialization.
+"""
+import hashlib
+import json
+import catalog
+from bin_state import mirror
+from emissions import record_empty
+from idempotency import run_once, validate_event_id
+from ingest import ingest_items, make_item
+from materials import material_name, resolve_material
+
+MAX_BATCH_ITEMS = 1000
+
+def refresh_state(conn, result):
+    """Reload the in-memory bin state and catalog after a successful (committed) write"""
+    if result[1] < 400:
+        mirror.refresh(conn)
+        catalog.sync(conn)
+    return result
+
+def get_dashboard_data(conn):
+    """Collect the dashboard aggregates as plain dicts and lists"""
+    # Current status and emissions summary come from the in-memory mirror
+    snapshot = mirror.snapshot()
+
+    # Get recent logs (last 20 entries)
+    logs = conn.execute('''
+        SELECT l.id, l.waste_type, l.volume, l.weight,
+               COALESCE(b.name, l.brand) AS brand, COALESCE(p.name, l.product) AS product,
+               l.event_type, l.co2_emissions, l.factor_version, l.material_id,
+               l.confidence, l.source, l.product_id, l.brand_id, l.timestamp
+        FROM trash_logs l
+        LEFT JOIN products p ON p.id = l.product_id
+        LEFT JOIN brands b ON b.id = l.brand_id
+        ORDER BY l.timestamp DESC, l.id DESC
+        LIMIT 20
+    ''').fetchall()
+
+    # Get statistics
+    stats = conn.execute('''
+        SELECT
+            waste_type,
+            COUNT(*) as count,
+            SUM(volume) as total_volume,
+            SUM(weight) as total_weight,
+            AVG(volume) as avg_volume,
+            AVG(weight) as avg_weight,
+            SUM(co2_emissions) as total_co2
+        FROM trash_logs
+        GROUP BY waste_type
+    ''').fetchall()
+
+    # Calculate monthly trend data (last 30 days)
+    monthly_emissions = conn.execute('''
+        SELECT
+            DATE(timestamp) as date,
+            waste_type,
+            SUM(weight) as daily_weight,
+            SUM(co2_emissions) as daily_co2
+        FROM trash_logs
+        WHERE timestamp >= date('now', '-30 days')
+        GROUP BY DATE(timestamp), waste_type
+        ORDER BY date DESC
+    ''').fetchall()
+
+    # Get hourly capacity data for today's chart
+    hourly_capacity = conn.execute('''
+        SELECT
+            strftime('%H:00', timestamp) as hour,
+            waste_type,
+            AVG(volume) as avg_volume,
+            COUNT(*) as event_count
+        FROM trash_logs
+        WHERE DATE(timestamp) = DATE('now')
+        GROUP BY strftime('%H', timestamp), waste_type
+        ORDER BY hour
+    ''').fetchall()
+
+    # Get daily collected weight from last 7 days
+    daily_weight_data = conn.execute('''
+        SELECT
+            DATE(timestamp) as date,
+            waste_type,
+            SUM(CASE WHEN event_type = 'add' THEN weight ELSE 0 END) as total_weight
+        FROM trash_logs
+        WHERE timestamp >= date('now', '-7 days')
+        GROUP BY DATE(timestamp), waste_type
+        ORDER BY date ASC
+    ''').fetchall()
+
+    # Organize daily weight data
+    daily_weights = {}
+    for row in daily_weight_data:
+        date = row['date']
+        waste_type = row['waste_type']
+        weight = row['total_weight']
+
+        if date not in daily_weights:
+            daily_weights[date] = {'normal': 0, 'recycle': 0}
+
+        daily_weights[date][waste_type] = weight
+
+    # Convert to list format for chart
+    daily_capacity = []
+    for date in sorted(daily_weights.keys()):
+        daily_capacity.append({
+            'date': date,
+            'normal_weight': daily_weights[date].get('normal', 0),
+            'recycle_weight': daily_weights[date].get('recycle', 0)
+        })
+
+    # Get product statistics (top 10 products), grouped by canonical product and brand IDs
+    product_stats = conn.execute('''
+        SELECT
+            p.name as product,
+            b.name as brand,
+            s.*
+        FROM (
+            SELECT
+                product_id,
+                brand_id,
+                COUNT(*) as total_items,
+                SUM(CASE WHEN waste_type = 'recycle' THEN 1 ELSE 0 END) as recycle_count,
+                SUM(CASE WHEN waste_type = 'normal' THEN 1 ELSE 0 END) as normal_count,
+                SUM(weight) as total_weight,
+                SUM(co2_emissions) as total_co2
+            FROM trash_logs
+            WHERE event_type = 'add' AND product_id IS NOT NULL
+            GROUP BY product_id, brand_id
+            ORDER BY total_items DESC
+            LIMIT 10
+        ) s
+        JOIN products p ON p.id = s.product_id
+        LEFT JOIN brands b ON b.id = s.brand_id
+        ORDER BY s.total_items DESC
+    ''').fetchall()
+
+    # Get material statistics (added items by material, emissions from the rollup)
+    material_rows = conn.execute('''
+        SELECT
+            material_id,
+            COUNT(*) as total_items,
+            SUM(weight) as total_weight
+        FROM trash_logs
+        WHERE event_type = 'add' AND material_id IS NOT NULL
+        GROUP BY material_id
+    ''').fetchall()
+    material_co2 = dict(conn.execute('''
+        SELECT material_id, SUM(net_co2_emissions)
+        FROM material_emissions
+        GROUP BY material_id
+    ''').fetchall())
+
+    material_stats = []
+    for row in material_rows:
+        material_stats.append({
+            'material_id': row['material_id'],
+            'material': material_name(row['material_id']),
+            'total_items': row['total_items'],
+            'total_weight': row['total_weight'],
+            'total_co2': material_co2.get(row['material_id'], 0)
+        })
+    material_stats.sort(key=lambda material: material['total_weight'], reverse=True)
+
+    return {
+        'status': snapshot.status,
+        'emissions': snapshot.emissions,
+        'logs': [dict(row) for row in logs],
+        'stats': [dict(row) for row in stats],
+        'product_stats': [dict(row) for row in product_stats],
+        'material_stats': material_stats,
+        'monthly_emissions': [dict(row) for row in monthly_emissions],
+        'hourly_capacity': [dict(row) for row in hourly_capacity],
+        'daily_capacity': daily_capacity
+    }
+
+def get_dashboard(conn):
+    """Encode the dashboard aggregates as compact JSON
+
+    Returns the body and its ETag, so unchanged data can be answered with 304.
+    """
+    body = json.dumps(get_dashboard_data(conn), separators=(',', ':'))
+    return body, hashlib.sha1(body.encode()).hexdigest()
+
+def add_trash(conn, data):
+    """Add a detailed trash entry, at most once per event_id"""
+    event_id = data.get('event_id')
+    error = validate_event_id(event_id)
+    if error:
+        return {'error': error}, 400
+    return refresh_state(conn, run_once(conn, event_id, 'trash', ingest_trash, data))
+
+def parse_confidence(value):
+    """Convert a confidence from a request into a float in [0, 1], or None if not given
+
+    Raises ValueError with a client-facing message for invalid input.
+    """
+    if value is None or value == '':
+        return None
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        confidence = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('confidence must be a number between 0 and 1')
+    if not 0 <= confidence <= 1:
+        raise ValueError('confidence must be a number between 0 and 1')
+    return confidence
+
+def parse_name(data, field):
+    """Read a product or brand name from a request as a string ('' if not given)
+
+    Numbers are kept as their text (e.g. a product code); other types raise
+    ValueError with a client-facing message.
+    """
+    value = data.get(field)
+    if value is None:
+        return ''
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if not isinstance(value, str):
+        raise ValueError(f'{field} must be a string')
+    return value
+
+def parse_trash(data):
+    """Convert a detailed trash entry into an ingest item
+
+    Raises ValueError with a client-facing message for invalid input.
+    """
+    waste_type = data.get('waste_type', '').lower()
+    volume = float(data.get('volume', 0))
+    weight = float(data.get('weight', 0)) * 0.001
+
+    if waste_type not in ['normal', 'recycle']:
+        raise ValueError('Invalid waste_type. Must be "normal" or "recycle"')
+
+    if volume <= 0 or weight <= 0:
+        raise ValueError('Volume and weight must be positive numbers')
+
+    return make_item(waste_type, volume, weight,
+                     brand=parse_name(data, 'brand'),
+                     product=parse_name(data, 'product'),
+                     material_id=resolve_material(data.get('material')),
+                     confidence=parse_confidence(data.get('confidence')))
+
+def ingest_trash(conn, data):
+    """Write a detailed trash entry without committing"""
+    try:
+        item = parse_trash(data)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    ingest_items(conn, [item])
+
+    # Get updated status
+    status = conn.execute('SELECT * FROM trashbin_status ORDER BY id DESC LIMIT 1').fetchone()
+
+    return {
+        'success': True,
+        'message': f'{item["waste_type"].capitalize()} waste added successfully',
+        'current_status': {
+            'normal_volume': status['normal_volume'],
+            'normal_weight': status['normal_weight'],
+            'recycle_volume': status['recycle_volume'],
+            'recycle_weight': status['recycle_weight']
+        }
+    }, 201
+
+def add_item(conn, data):
+    """Add an item using the simplified JSON format, at most once per event_id"""
+    event_id = data.get('event_id')
+    error = validate_event_id(event_id)
+    if error:
+        return {'error': error}, 400
+    return refresh_state(conn, run_once(conn, event_id, 'add-item', ingest_item, data))
+
+def parse_item(data):
+    """Convert an item in the simplified JSON format into an ingest item
+
+    Raises ValueError with a client-facing message for invalid input.
+    """
+    try:
+        weight_in_gram = int(data.get('weight_in_gram', 0))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid data format. weight_in_gram must be an integer')
+
+    # Validate input
+    if weight_in_gram <= 0:
+        raise ValueError('weight_in_gram must be a positive number')
+
+    # Convert to internal format
+    waste_type = 'recycle' if data.get('recyclable', False) else 'normal'
+    weight = weight_in_gram / 1000.0  # Convert grams to kg
+    volume = weight * 1.2  # Estimate volume (1.2L per kg as rough estimate)
+
+    return make_item(waste_type, volume, weight,
+                     brand=parse_name(data, 'product_brand'),
+                     product=parse_name(data, 'product_name'),
+                     material_id=resolve_material(data.get('material')),
+                     confidence=parse_confidence(data.get('confidence')))
+
+def ingest_item(conn, data):
+    """Write an item in the simplified JSON format without committing"""
+    try:
+        item = parse_item(data)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    ingest_items(conn, [item])
+
+    # Get updated status
+    status = conn.execute('SELECT * FROM trashbin_status ORDER BY id DESC LIMIT 1').fetchone()
+
+    recyclable = item['waste_type'] == 'recycle'
+    material_id = item['material_id']
+    return {
+        'success': True,
+        'message': f'{"Recyclable" if recyclable else "Normal"} item added successfully',
+        'item': {
+            'product_name': item['product'],
+            'product_brand': item['brand'],
+            'weight_kg': item['weight'],
+            'recyclable': recyclable,
+            'material': material_name(material_id) if material_id is not None else None
+        },
+        'current_status': {
+            'normal_weight_kg': status['normal_weight'],
+            'recycle_weight_kg': status['recycle_weight']
+        }
+    }, 201
+
+def add_items(conn, data):
+    """Add a batch of items in the simplified JSON format, at most once per event_id"""
+    event_id = data.get('event_id')
+    error = validate_event_id(event_id)
+    if error:
+        return {'error': error}, 400
+    return refresh_state(conn, run_once(conn, event_id, 'add-items', ingest_item_batch, data))
+
+def ingest_item_batch(conn, data):
+    """Write a batch of simplified JSON items without committing
+
+    The batch is all-or-nothing: any invalid item rejects the whole request.
+    """
+    entries = data.get('items')
+    if not isinstance(entries, list) or not entries:
+        return {'error': 'items must be a non-empty list'}, 400
+    if len(entries) > MAX_BATCH_ITEMS:
+        return {'error': f'A batch can contain at most {MAX_BATCH_ITEMS} items'}, 400
+
+    items = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            return {'error': f'Item {index}: must be a JSON object'}, 400
+        try:
+            items.append(parse_item(entry))
+        except ValueError as e:
+            return {'error': f'Item {index}: {e}'}, 400
+
+    ingest_items(conn, items)
+
+    # Get updated status
+    status = conn.execute('SELECT * FROM trashbin_status ORDER BY id DESC LIMIT 1').fetchone()
+
+    return {
+        'success': True,
+        'message': f'{len(items)} items added successfully',
+        'count': len(items),
+        'current_status': {
+            'normal_weight_kg': status['normal_weight'],
+            'recycle_weight_kg': status['recycle_weight']
+        }
+    }, 201
+
+def reset_bin(conn, data):
+    """Reset/empty one or both bins and record their emissions"""
+    waste_type = data.get('waste_type', 'both').lower()
+    bins = [waste_type] if waste_type in ['normal', 'recycle'] else ['normal', 'recycle']
+
+    cursor = conn.cursor()
+
+    # Get current values before reset
+    current = cursor.execute('SELECT * FROM trashbin_status ORDER BY id DESC LIMIT 1').fetchone()
+
+    for bin_type in bins:
+        cursor.execute(f'''
+            UPDATE trashbin_status
+            SET {bin_type}_volume = 0,
+                {bin_type}_weight = 0,
+                last_updated = CURRENT_TIMESTAMP
+            WHERE id = (SELECT MAX(id) FROM trashbin_status)
+        ''')
+
+        # Log the empty event and update the emissions summary in the same transaction
+        record_empty(cursor, bin_type,
+                     current[f'{bin_type}_volume'], current[f'{bin_type}_weight'])
+
+    conn.commit()
+
+    return refresh_state(conn, ({
+        'success': True,
+        'message': f'{waste_type.capitalize()} bin reset successfully'
+    }, 200))
+
+def unavailable_result(error):
+    """503 payload, status and headers telling the client when the classifier may be back"""
+    headers = {}
+    if error.retry_after:
+        headers['Retry-After'] = str(max(1, round(error.retry_after)))
+    return {'error': str(error)}, 503, headers
+
+def get_forecast(conn, args):
+    """Forecast time to full and a collection schedule for the bins
+
+    args may set horizon (hours ahead, 1-720) and collect_at (fill percent
+    at which a bin should be collected, 1-100).
+    """
+    # numpy is only imported once a forecast is asked for
+    import forecasting
+
+    try:
+        horizon = int(args.get('horizon', forecasting.FORECAST_HORIZON_HOURS))
+        collect_at = float(args.get('collect_at', forecasting.COLLECT_AT_PERCENT))
+    except (TypeError, ValueError):
+        return {'error': 'horizon must be an integer and collect_at a number'}, 400
+    if not 1 <= horizon <= 720:
+        return {'error': 'horizon must be between 1 and 720 hours'}, 400
+    if not 1 <= collect_at <= 100:
+        return {'error': 'collect_at must be between 1 and 100 percent'}, 400
+
+    # Only the events logged since the last forecast are read
+    forecasting.model.update(conn)
+    return forecasting.build_forecast(forecasting.model, mirror.snapshot().status,
+                                      horizon=horizon, collect_at_percent=collect_at), 200
+
+def record_detections(conn, resp_dict, event_id=None):
+    """Log the items returned by the classifier, at most once per event_id
+
+    Cached fallback results (classifier unavailable) are returned without
+    logging anything: the model never saw this image, so its items must not
+    be added to the bins. The event_id stays unused, so a retry once the
+    classifier is back records the real result.
+    """
+    if resp_dict.get("fallback"):
+        return resp_dict, 200
+    return refresh_state(conn, run_once(conn, event_id, 'detect', ingest_detections, resp_dict))
+
+def ingest_detections(conn, resp_dict):
+    """Write the items returned by the classifier without committing"""
+    items = []
+    for out in resp_dict["out"]:
+        items.append(make_item(
+            "recycle" if out["recyclable"] else "normal",
+            out["volume"] * 0.001,
+            out["weight"] * 0.001,
+            brand=out["brand_name"],
+            product=out["item_description"],
+            material_id=out["id"],
+            confidence=out.get("confidence"),
+            source='vision'
+        ))
+
+    ingest_items(conn, items)
+
+    usage = resp_dict.get("usage")
+    if usage:
+        conn.execute('''
+            INSERT INTO classifier_calls (prompt_mode, model, input_tokens, cached_tokens, output_tokens,
+                                          latency_ms, items)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (usage["prompt_mode"], usage["model"], usage["input_tokens"], usage["cached_tokens"],
+              usage["output_tokens"], usage["latency_ms"], len(items)))
+
+    return resp_dict, 200
@@ -0,0 +1,108 @@
+"""
+Measure how long the dashboard app takes to import and to serve its first requests
+
+Each run starts a fresh Python process that imports the app (app.py or
+asgi_app.py), initializes a scratch database and serves GET /api/status
+and GET /api/dashboard. It reports the import time, the time to the first
+response and the process wall time, and which heavy modules (OpenCV,
+openai, pydantic, numpy) were loaded by then, which should be none.
+
+Usage:
+    python startup_benchmark.py [--app app|asgi_app] [--repeat 5] [--headless]
+
+Example:
+    python startup_benchmark.py --app asgi_app --repeat 10
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ('cv2', 'openai', 'pydantic', 'numpy')
+FIRST_REQUESTS = ('/api/status', '/api/dashboard')
+
+
+def child(app_name, db_path):
+    """Import the app and serve the first requests (runs in the measured process)"""
+    started = time.perf_counter()
+    module = __import__(app_name)
+    imported = time.perf_counter()
+
+    import database
+    database.DATABASE = db_path
+
+    if app_name == 'asgi_app':
+        import asyncio
+
+        async def serve():
+            async with module.app.test_app() as test_app:
+                client = test_app.test_client()
+                return [(await client.get(path)).status_code for path in FIRST_REQUESTS]
+
+        statuses = asyncio.run(serve())
+    else:
+        database.init_db()
+        client = module.app.test_client()
+        statuses = [client.get(path).status_code for path in FIRST_REQUESTS]
+    served = time.perf_counter()
+
+    print(json.dumps({
+        'import_ms': (imported - started) * 1000,
+        'first_request_ms': (served - started) * 1000,
+        'statuses': statuses,
+        'heavy_modules': [name for name in HEAVY_MODULES if name in sys.modules]
+    }))
+
+def run_once(app_name, headless):
+    """Run one measured process and return its report plus the wall time"""
+    with tempfile.TemporaryDirectory() as scratch:
+        env = dict(os.environ)
+        if headless:
+            env['HEADLESS'] = '1'
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', app_name, os.path.join(scratch, 'bench.db')],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        wall = (time.perf_counter() - started) * 1000
+    report = json.loads(output.strip().splitlines()[-1])
+    report['wall_ms'] = wall
+    return report
+
+def print_report(reports):
+    print(f"{'':<18}{'min':>9}{'median':>9}{'max':>9}")
+    for key, label in (('import_ms', 'import (ms)'), ('first_request_ms', 'first request (ms)'),
+                       ('wall_ms', 'process (ms)')):
+        values = sorted(report[key] for report in reports)
+        print(f"{label:<18}{values[0]:>9.0f}{values[len(values) // 2]:>9.0f}{values[-1]:>9.0f}")
+
+    statuses = reports[-1]['statuses']
+    if all(status == 200 for status in statuses):
+        print(f"\n✓ First requests answered: {', '.join(FIRST_REQUESTS)}")
+    else:
+        print(f"\n✗ First requests failed: {dict(zip(FIRST_REQUESTS, statuses))}")
+
+    heavy = sorted({name for report in reports for name in report['heavy_modules']})
+    if heavy:
+        print(f"✗ Heavy modules loaded at startup: {', '.join(heavy)}")
+    else:
+        print(f"✓ No heavy modules loaded at startup ({', '.join(HEAVY_MODULES)})")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == '--child':
+        child(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Measure import time and time to first request")
+    parser.add_argument('--app', default='app', choices=('app', 'asgi_app'), help="Which app to start")
+    parser.add_argument('--repeat', type=int, default=5, help="Number of fresh processes to measure")
+    parser.add_argument('--headless', action='store_true', help="Start in headless (no OpenCV) mode")
+    args = parser.parse_args()
+
+    print(f"Starting {args.app} {args.repeat} time(s){' in headless mode' if args.headless else ''}")
+    print("-" * 50)
+    print_report([run_once(args.app, args.headless) for _ in range(args.repeat)])
@@ -1,4 +1,5 @@
-const CACHE_NAME = 'trashbin-v1';
+const CACHE_NAME = 'trashbin-v2';
+const DATA_URL = '/api/dashboard';
 const urlsToCache = [
   '/',
   '/static/style.css',
@@ -10,22 +11,49 @@ self.addEventListener('install', event => {
   event.waitUntil(
     caches.open(CACHE_NAME)
       .then(cache => cache.addAll(urlsToCache))
+      .then(() => self.skipWaiting())
   );
 });
 
-// Fetch from cache, fallback to network
-self.addEventListener('fetch', event => {
-  event.respondWith(
-    caches.match(event.request)
-      .then(response => {
-        // Cache hit - return response
-        if (response) {
-          return response;
+// Answer from the cache at once and refresh the cached copy from the network.
+// When the dashboard data changed, post it to the page that asked for it.
+function staleWhileRevalidate(event, notify) {
+  const cached = caches.open(CACHE_NAME).then(cache => cache.match(event.request));
+
+  const revalidated = Promise.all([cached, fetch(event.request)])
+    .then(async ([previous, response]) => {
+      if (response.ok) {
+        const etag = response.headers.get('ETag');
+        const cache = await caches.open(CACHE_NAME);
+        await cache.put(event.request, response.clone());
+
+        if (notify && previous && previous.headers.get('ETag') !== etag) {
+          const client = await self.clients.get(event.clientId);
+          if (client) {
+            client.postMessage({ type: 'dashboard', etag: etag, data: await response.clone().json() });
+          }
         }
-        return fetch(event.request);
       }
-    )
-  );
+      return response;
+    });
+
+  event.respondWith(cached.then(previous => previous || revalidated));
+  event.waitUntil(revalidated.catch(() => {}));
+}
+
+// The page shell and dashboard data are stale-while-revalidate; everything else
+// (API writes, status, camera feed) goes straight to the network
+self.addEventListener('fetch', event => {
+  const url = new URL(event.request.url);
+  if (event.request.method !== 'GET' || url.origin !== self.location.origin) {
+    return;
+  }
+
+  if (url.pathname === DATA_URL) {
+    staleWhileRevalidate(event, true);
+  } else if (urlsToCache.includes(url.pathname)) {
+    staleWhileRevalidate(event, false);
+  }
 });
 
 // Update service worker
@@ -40,6 +68,6 @@ self.addEventListener('activate', event => {
           }
         })
       );
-    })
+    }).then(() => self.clients.claim())
   );
 });
@@ -0,0 +1,11 @@
+"""
+Small statistics helpers shared by the benchmark scripts
+"""
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values (0.0 when empty)"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
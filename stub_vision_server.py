@@ -0,0 +1,146 @@
+"""
+Local stand-in for the vision API that injects latency and errors
+
+Answers POST /v1/responses with one classified item in the format the
+request asks for (full or compact schema), after a configurable delay, and
+fails a configurable share of calls. Point the dashboard at it to check
+the classifier's deadlines, retries and circuit breaker:
+
+    python stub_vision_server.py --latency 0.5 --error-rate 0.3
+    OPENAI_BASE_URL=http://localhost:8001/v1 OPENAI_API_KEY=stub python app.py
+
+Fault injection can be changed while the server runs:
+
+    curl -X POST localhost:8001/stub/config -d '{"error_rate": 1.0}'
+    curl -X POST localhost:8001/stub/config -d '{"fail_next": 2}'
+    curl localhost:8001/stub/config
+
+Usage:
+    python stub_vision_server.py [--port 8001] [--latency 0] [--jitter 0]
+                                 [--error-rate 0] [--error-status 503]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ITEM = {
+    'id': 3,
+    'item_description': 'Plastic Bottle',
+    'brand_name': 'Namthip',
+    'weight': 7,
+    'volume': 500,
+    'recyclable': True,
+    'confidence': 0.9
+}
+COMPACT_ITEM = {'m': 3, 'd': 'Plastic Bottle', 'b': 'Namthip', 'g': 7, 'ml': 500, 'r': True, 'c': 0.9}
+
+# fail_next makes that many upcoming calls fail, for deterministic retries
+config = {'latency': 0.0, 'jitter': 0.0, 'error_rate': 0.0, 'error_status': 503, 'fail_next': 0}
+counters = {'calls': 0, 'errors': 0}
+lock = threading.Lock()
+
+
+def build_response(request):
+    """Build a Responses API result for a request"""
+    schema = json.dumps(request.get('text', {}).get('format', {}).get('schema', {}))
+    item = COMPACT_ITEM if 'CompactOut' in schema else ITEM
+    text = json.dumps({'out': [item]})
+    input_tokens = 300 if request.get('instructions') else 900
+
+    return {
+        'id': f'resp_stub_{int(time.time() * 1000)}',
+        'object': 'response',
+        'created_at': int(time.time()),
+        'model': request.get('model', 'stub'),
+        'status': 'completed',
+        'output': [{
+            'type': 'message',
+            'id': 'msg_stub',
+            'role': 'assistant',
+            'status': 'completed',
+            'content': [{'type': 'output_text', 'text': text, 'annotations': []}]
+        }],
+        'parallel_tool_calls': False,
+        'tool_choice': 'auto',
+        'tools': [],
+        'usage': {
+            'input_tokens': input_tokens,
+            'input_tokens_details': {'cached_tokens': 0},
+            'output_tokens': len(text) // 4,
+            'output_tokens_details': {'reasoning_tokens': 0},
+            'total_tokens': input_tokens + len(text) // 4
+        }
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        if self.path == '/stub/config':
+            with lock:
+                return self.send_json({**config, **counters})
+        self.send_json({'error': {'message': 'Not found'}}, 404)
+
+    def do_POST(self):
+        if self.path == '/stub/config':
+            with lock:
+                config.update({key: value for key, value in self.read_json().items() if key in config})
+                return self.send_json(config)
+
+        if not self.path.endswith('/responses'):
+            return self.send_json({'error': {'message': 'Not found'}}, 404)
+
+        request = self.read_json()
+        with lock:
+            counters['calls'] += 1
+            settings = dict(config)
+            fail = settings['fail_next'] > 0 or random.random() < settings['error_rate']
+            if settings['fail_next'] > 0:
+                config['fail_next'] -= 1
+            if fail:
+                counters['errors'] += 1
+
+        time.sleep(max(0.0, settings['latency'] + random.uniform(-settings['jitter'], settings['jitter'])))
+        if fail:
+            return self.send_json({'error': {'message': 'Injected failure', 'type': 'server_error'}},
+                                  settings['error_status'])
+        self.send_json(build_response(request))
+
+    def log_message(self, format, *args):
+        print(format % args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub vision API with injected latency and errors")
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds before each answer")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Random +/- seconds added to the latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of calls that fail (0-1)")
+    parser.add_argument('--error-status', type=int, default=503, help="HTTP status of injected failures")
+    args = parser.parse_args()
+
+    config.update(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                  error_status=args.error_status)
+    server = ThreadingHTTPServer(('0.0.0.0', args.port), StubHandler)
+    print(f"Stub vision API on http://localhost:{args.port}/v1 (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
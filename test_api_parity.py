@@ -0,0 +1,193 @@
+"""
+Check that app.py (Flask) and asgi_app.py (Quart) answer the same requests the same way
+
+Each app gets a fresh scratch database and the same scripted requests, with
+the vision model stubbed. Status codes and JSON bodies must match, apart
+from wall-clock timestamps.
+
+Usage:
+    python -m pytest test_api_parity.py
+"""
+import asyncio
+import copy
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app as flask_app
+import asgi_app
+import camera
+import catalog
+import database
+import forecasting
+from bin_state import mirror
+from idempotency import recent_events
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+with open(os.path.join(HERE, '0.jpg'), 'rb') as f:
+    JPEG = f.read()
+
+# Wall-clock values that differ between the two runs
+VOLATILE_KEYS = ('timestamp', 'last_updated', 'changed_at', 'created_at')
+
+CLASSIFIED = {
+    'out': [{
+        'id': 3,
+        'item_description': 'Plastic Bottle',
+        'brand_name': 'Acme',
+        'weight': 20,
+        'volume': 500,
+        'recyclable': True,
+        'confidence': 0.9
+    }],
+    'usage': {
+        'prompt_mode': 'full',
+        'model': 'stub',
+        'input_tokens': 900,
+        'cached_tokens': 0,
+        'output_tokens': 30,
+        'latency_ms': 5
+    }
+}
+
+# Stands for the ETag of the previous response to the same path
+PREVIOUS_ETAG = object()
+
+# (method, path, request options)
+REQUESTS = [
+    ('GET', '/api/status', {}),
+    ('GET', '/api/status', {'headers': {'If-None-Match': PREVIOUS_ETAG}}),
+    ('POST', '/api/trash', {'json': {'waste_type': 'recycle', 'volume': 1.5, 'weight': 0.2,
+                                     'brand': 'Acme', 'product': 'Plastic Bottle', 'material': 'plastic'}}),
+    ('POST', '/api/trash', {'json': {'waste_type': 'compost', 'volume': 1, 'weight': 1}}),
+    ('POST', '/api/trash', {'json': {'waste_type': 'normal', 'volume': 1, 'weight': 1, 'material': True}}),
+    ('POST', '/api/add-item', {'json': {'product_name': 'plastic bottles', 'product_brand': 'Acme',
+                                        'weight_in_gram': 25, 'recyclable': True, 'confidence': 0.8,
+                                        'event_id': 'item-1'}}),
+    ('POST', '/api/add-item', {'json': {'product_name': 'plastic bottles', 'product_brand': 'Acme',
+                                        'weight_in_gram': 25, 'recyclable': True, 'confidence': 0.8,
+                                        'event_id': 'item-1'}}),
+    ('POST', '/api/add-item', {'json': {'product_name': 'Cup', 'weight_in_gram': 5, 'confidence': 'high'}}),
+    ('POST', '/api/trash', {'json': {'waste_type': 'normal', 'volume': 1, 'weight': 1, 'event_id': 'item-1'}}),
+    ('POST', '/api/add-items', {'json': {'items': [
+        {'product_name': 'Paper Cup', 'product_brand': 'Cafe', 'weight_in_gram': 10, 'recyclable': False},
+        {'product_name': 'Can', 'product_brand': 'Cola', 'weight_in_gram': 15, 'recyclable': True,
+         'material': 4}
+    ], 'event_id': 'batch-1'}}),
+    ('POST', '/api/add-items', {'json': {'items': [{'weight_in_gram': 5, 'confidence': 7}]}}),
+    ('GET', '/api/dashboard', {}),
+    ('GET', '/api/dashboard', {'headers': {'If-None-Match': PREVIOUS_ETAG}}),
+    ('GET', '/api/forecast', {}),
+    ('GET', '/api/forecast', {'query_string': {'horizon': 'soon'}}),
+    ('GET', '/api/camera-feed', {}),
+    ('GET', '/api/detect', {'query_string': {'event_id': 'detect-0'}}),
+    ('POST', '/api/camera-feed', {'data': JPEG, 'headers': {'Content-Type': 'image/jpeg'}}),
+    ('POST', '/api/camera-feed', {'json': {'image': 123}}),
+    ('POST', '/api/camera-feed', {'data': b'GIF89a', 'headers': {'Content-Type': 'image/gif'}}),
+    ('POST', '/api/camera-feed', {'data': JPEG, 'headers': {'Content-Type': 'image/jpeg'},
+                                  'query_string': {'camera': 'missing'}}),
+    ('GET', '/api/camera-feed', {}),
+    ('GET', '/api/detect', {'query_string': {'event_id': 'detect-1'}}),
+    ('GET', '/api/detect', {'query_string': {'event_id': 'detect-1'}}),
+    ('POST', '/api/camera-feed', {'data': JPEG, 'headers': {'Content-Type': 'image/jpeg'},
+                                  'query_string': {'detect': '1', 'event_id': 'detect-2'}}),
+    ('POST', '/api/reset', {'json': {'waste_type': 'recycle'}}),
+    ('POST', '/api/reset', {'json': {}}),
+    ('GET', '/api/status', {}),
+    ('GET', '/api/dashboard', {}),
+    ('GET', '/api/forecast', {'query_string': {'horizon': '24', 'collect_at': '50'}}),
+]
+
+
+def mask(value):
+    """Replace the wall-clock values in a JSON body"""
+    if isinstance(value, dict):
+        return {key: '<time>' if key in VOLATILE_KEYS else mask(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [mask(item) for item in value]
+    return value
+
+def resolve_options(options, etags, path):
+    """Copy the request options, filling in the ETag to revalidate with"""
+    headers = dict(options.get('headers', {}))
+    if headers.get('If-None-Match') is PREVIOUS_ETAG:
+        headers['If-None-Match'] = etags[path]
+    return dict(options, headers=headers)
+
+def record(responses, etags, path, status_code, headers, body):
+    """Keep the status code and masked JSON body of a response, and its ETag"""
+    etags[path] = headers.get('ETag')
+    responses.append((status_code, mask(json.loads(body)) if body else None))
+
+def run_flask():
+    database.init_db()
+    client = flask_app.app.test_client()
+    responses, etags = [], {}
+    for method, path, options in REQUESTS:
+        response = client.open(path, method=method, **resolve_options(options, etags, path))
+        record(responses, etags, path, response.status_code, response.headers, response.get_data())
+    return responses
+
+async def run_quart():
+    responses, etags = [], {}
+    async with asgi_app.app.test_app() as test_app:
+        client = test_app.test_client()
+        for method, path, options in REQUESTS:
+            response = await client.open(path, method=method, **resolve_options(options, etags, path))
+            record(responses, etags, path, response.status_code, response.headers, await response.get_data())
+    return responses
+
+@pytest.fixture
+def fresh_state(tmp_path, monkeypatch):
+    """Point the shared modules at a new scratch database with empty caches"""
+    def reset(name):
+        monkeypatch.setattr(database, 'DATABASE', str(tmp_path / f'{name}.db'))
+        monkeypatch.setattr(mirror, 'refresh_interval', 0)
+        monkeypatch.setattr(mirror, '_snapshot', None)
+        monkeypatch.setattr(catalog, 'products', catalog.Catalog('products'))
+        monkeypatch.setattr(catalog, 'brands', catalog.Catalog('brands'))
+        monkeypatch.setattr(forecasting, 'model', forecasting.FillRateModel())
+        monkeypatch.setattr(camera, 'cameras', {camera.DEFAULT_CAMERA_ID: camera.Camera(camera.DEFAULT_CAMERA_ID)})
+        # The Quart app shuts its executor down when the test app stops
+        monkeypatch.setattr(asgi_app, 'db_executor', ThreadPoolExecutor(max_workers=asgi_app.DB_WORKERS))
+        recent_events.clear()
+    return reset
+
+@pytest.fixture
+def stub_classifier(monkeypatch):
+    async def classify_async(image):
+        return copy.deepcopy(CLASSIFIED)
+
+    monkeypatch.setattr(flask_app, 'classify', lambda image: copy.deepcopy(CLASSIFIED))
+    monkeypatch.setattr(asgi_app, 'classify_async', classify_async)
+
+def test_flask_and_quart_answer_the_same(fresh_state, stub_classifier, monkeypatch):
+    # Forecasts are relative to now, so both runs use the same now
+    now = forecasting.utc_now()
+    monkeypatch.setattr(forecasting, 'utc_now', lambda: now)
+
+    fresh_state('flask')
+    flask_responses = run_flask()
+    fresh_state('quart')
+    quart_responses = asyncio.run(run_quart())
+
+    assert len(flask_responses) == len(quart_responses) == len(REQUESTS)
+    for (method, path, options), flask_response, quart_response in zip(REQUESTS, flask_responses, quart_responses):
+        assert flask_response == quart_response, f"{method} {path} {options.get('json') or options.get('query_string') or ''}"
+
+def test_script_covers_every_outcome(fresh_state, stub_classifier):
+    fresh_state('flask')
+    statuses = {(path, status_code) for (method, path, options), (status_code, body)
+                in zip(REQUESTS, run_flask())}
+
+    assert ('/api/status', 304) in statuses
+    assert ('/api/dashboard', 304) in statuses
+    assert {('/api/trash', 201), ('/api/trash', 400), ('/api/trash', 409)} <= statuses
+    assert {('/api/add-item', 201), ('/api/add-item', 400)} <= statuses
+    assert {('/api/add-items', 201), ('/api/add-items', 400)} <= statuses
+    assert {('/api/forecast', 200), ('/api/forecast', 400)} <= statuses
+    assert {('/api/camera-feed', 200), ('/api/camera-feed', 400), ('/api/camera-feed', 404)} <= statuses
+    assert {('/api/detect', 200), ('/api/detect', 400)} <= statuses
+    assert ('/api/reset', 200) in statuses
@@ -0,0 +1,210 @@
+"""
+Check the classifier's retries, deadlines, circuit breaker and cached fallback
+
+The classifier runs against stub_vision_server.py in the same process, so
+its faults (latency, errors, fail_next) can be set per test.
+
+Usage:
+    python -m pytest test_resilience.py
+"""
+import asyncio
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+import classifier
+import resilience
+import stub_vision_server
+from resilience import CircuitBreaker, Unavailable
+
+DEFAULT_CONFIG = dict(stub_vision_server.config)
+
+
+def image(name):
+    return f"data:image/jpeg;base64,{name}"
+
+def stub_calls():
+    with stub_vision_server.lock:
+        return stub_vision_server.counters['calls']
+
+def set_faults(**settings):
+    with stub_vision_server.lock:
+        stub_vision_server.config.update(settings)
+
+@pytest.fixture
+def stub():
+    """Run the stub vision API on a free port with no faults"""
+    set_faults(**DEFAULT_CONFIG)
+    stub_vision_server.counters.update(calls=0, errors=0)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), stub_vision_server.StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+    set_faults(**DEFAULT_CONFIG)
+
+@pytest.fixture
+def guard(stub, monkeypatch):
+    """Point the classifier at the stub with short deadlines, returning its resilience guard"""
+    def build(deadline=5.0, timeout=2.0, retries=2, concurrency=8, cooldown=0.5):
+        monkeypatch.setenv('OPENAI_BASE_URL', stub)
+        monkeypatch.setenv('OPENAI_API_KEY', 'stub')
+        monkeypatch.setattr(classifier, 'CLASSIFY_DEADLINE', deadline)
+        monkeypatch.setattr(classifier, 'CLASSIFY_TIMEOUT', timeout)
+        monkeypatch.setattr(classifier, 'CLASSIFY_RETRIES', retries)
+        monkeypatch.setattr(classifier, 'CLASSIFY_CONCURRENCY', concurrency)
+        monkeypatch.setattr(classifier, 'CLASSIFY_BREAKER_COOLDOWN', cooldown)
+        monkeypatch.setattr(classifier, '_backend', None)
+        guard = classifier.backend().guard
+        guard.backoff = 0.05
+        return guard
+    return build
+
+def test_retry_then_success(guard):
+    guard()
+    set_faults(fail_next=1)
+
+    resp_dict = classifier.classify(image('retry'))
+
+    assert resp_dict['out'][0]['material'] == 'Plastic'
+    assert 'fallback' not in resp_dict
+    assert stub_calls() == 2
+
+def test_retry_then_success_async(guard):
+    guard()
+    set_faults(fail_next=1)
+
+    resp_dict = asyncio.run(classifier.classify_async(image('retry-async')))
+
+    assert resp_dict['out'][0]['material'] == 'Plastic'
+    assert stub_calls() == 2
+
+def test_deadline_exhaustion(guard):
+    guard(deadline=0.6, timeout=0.4)
+    set_faults(latency=1.0)
+
+    started = time.monotonic()
+    with pytest.raises(Unavailable):
+        classifier.classify(image('slow'))
+
+    assert time.monotonic() - started < 1.0
+    assert stub_calls() <= 2
+
+def test_retries_exhausted_counts_one_failure(guard):
+    resilient = guard(retries=2)
+    set_faults(error_rate=1.0)
+
+    with pytest.raises(Unavailable):
+        classifier.classify(image('down'))
+
+    assert stub_calls() == 3
+    assert list(resilient.breaker._outcomes) == [False]
+
+def test_breaker_opens_then_half_open_trial_closes_it(guard):
+    resilient = guard(retries=0, cooldown=0.5)
+    set_faults(error_rate=1.0)
+    for i in range(5):
+        with pytest.raises(Unavailable):
+            classifier.classify(image(f'outage-{i}'))
+    assert resilient.breaker.state == CircuitBreaker.OPEN
+
+    # Open: calls fail fast without reaching the stub
+    calls = stub_calls()
+    with pytest.raises(Unavailable) as error:
+        classifier.classify(image('rejected'))
+    assert stub_calls() == calls
+    assert error.value.retry_after > 0
+
+    # After the cooldown one slow trial goes through; others are still turned away
+    time.sleep(0.5)
+    set_faults(error_rate=0.0, latency=0.3)
+    trial = threading.Thread(target=classifier.classify, args=(image('trial'),))
+    trial.start()
+    time.sleep(0.1)
+    assert resilient.breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(Unavailable):
+        classifier.classify(image('during-trial'))
+    trial.join()
+
+    assert resilient.breaker.state == CircuitBreaker.CLOSED
+    assert stub_calls() == calls + 1
+
+def test_failed_trial_reopens_the_breaker(guard):
+    resilient = guard(retries=0, cooldown=0.3)
+    set_faults(error_rate=1.0)
+    for i in range(5):
+        with pytest.raises(Unavailable):
+            classifier.classify(image(f'outage-{i}'))
+
+    time.sleep(0.3)
+    with pytest.raises(Unavailable):
+        classifier.classify(image('trial'))
+
+    assert resilient.breaker.state == CircuitBreaker.OPEN
+
+def test_cached_fallback(guard):
+    guard(retries=0)
+    first = classifier.classify(image('seen'))
+    set_faults(error_rate=1.0)
+
+    fallback = classifier.classify(image('seen'))
+
+    assert fallback['fallback'] == 'cache'
+    assert fallback['usage'] is None
+    assert fallback['out'] == first['out']
+    with pytest.raises(Unavailable):
+        classifier.classify(image('unseen'))
+
+def test_waiting_for_a_slot_does_not_count_against_the_breaker(guard):
+    resilient = guard(deadline=0.3, retries=0, concurrency=1)
+
+    # Another call holds the only slot for longer than the deadline
+    resilient._slots.acquire()
+    try:
+        with pytest.raises(Unavailable, match='too many calls in flight'):
+            classifier.classify(image('queued'))
+    finally:
+        resilient._slots.release()
+
+    async def queued_async():
+        slots = resilient._async_slots.setdefault(asyncio.get_running_loop(), asyncio.Semaphore(1))
+        async with slots:
+            return await classifier.classify_async(image('queued-async'))
+
+    with pytest.raises(Unavailable, match='too many calls in flight'):
+        asyncio.run(queued_async())
+
+    assert stub_calls() == 0
+    assert list(resilient.breaker._outcomes) == []
+    assert resilient.breaker.state == CircuitBreaker.CLOSED
+
+def test_only_the_trial_call_releases_the_trial():
+    breaker = CircuitBreaker(min_calls=1, cooldown=0)
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    assert breaker.allow() == (True, True)
+    breaker.release()
+    assert breaker.allow() == (False, False)
+
+    # An outcome from a call started before the breaker opened does not decide
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.release(trial=True)
+    assert breaker.allow() == (True, True)
+
+def test_deadline_spent_waiting_is_not_recorded(monkeypatch):
+    resilient = resilience.Resilient('test', retryable=(ConnectionError,), deadline=0.2, concurrency=1)
+    # A clock that jumps past the deadline once the slot is acquired
+    times = iter([0.0, 0.0, 10.0, 10.0])
+    monkeypatch.setattr(resilience, 'time', SimpleNamespace(monotonic=lambda: next(times, 10.0), sleep=time.sleep))
+
+    with pytest.raises(Unavailable, match='before the call was made'):
+        resilient.call('key', lambda timeout: 'never called')
+
+    assert list(resilient.breaker._outcomes) == []